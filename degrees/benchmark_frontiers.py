@@ -0,0 +1,71 @@
+import argparse
+import random
+import time
+
+from util import (Node, StackFrontier, QueueFrontier,
+                  DequeStackFrontier, DequeQueueFrontier)
+
+SIZES = [10_000, 100_000, 1_000_000]
+
+FRONTIERS = [
+    ("StackFrontier", StackFrontier),
+    ("DequeStackFrontier", DequeStackFrontier),
+    ("QueueFrontier", QueueFrontier),
+    ("DequeQueueFrontier", DequeQueueFrontier),
+]
+
+# The list-based frontiers are quadratic, so above this size they are skipped
+LIST_LIMIT = 100_000
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare list-based and deque-based search frontiers.")
+    parser.add_argument("sizes", nargs="*", type=int, default=SIZES,
+                        help="number of nodes to push through each frontier")
+    parser.add_argument("--probes", type=int, default=1000,
+                        help="number of contains_state lookups per run")
+    parser.add_argument("--list-limit", type=int, default=LIST_LIMIT,
+                        help="largest size to run the list-based frontiers on")
+    args = parser.parse_args()
+
+    print(f"{'frontier':<20} {'nodes':>10} {'add':>10} {'contains':>10} {'remove':>10}")
+    for n in args.sizes:
+        for name, frontier_class in FRONTIERS:
+            if not name.startswith("Deque") and n > args.list_limit:
+                print(f"{name:<20} {n:>10} {'skipped (--list-limit)':>32}")
+                continue
+            add, contains, remove = benchmark(frontier_class, n, args.probes)
+            print(f"{name:<20} {n:>10} {add:>9.3f}s {contains:>9.3f}s {remove:>9.3f}s")
+
+
+def benchmark(frontier_class, n, probes):
+    """
+    Push `n` nodes into a new frontier, look up `probes` random states
+    (half of which are absent) and then remove every node.
+    Return the wall time of the three phases in seconds.
+    """
+    rng = random.Random(0)
+    lookups = [rng.randrange(2 * n) for _ in range(probes)]
+    frontier = frontier_class()
+
+    start = time.perf_counter()
+    for state in range(n):
+        frontier.add(Node(state, None, None))
+    add_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for state in lookups:
+        frontier.contains_state(state)
+    contains_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    while not frontier.empty():
+        frontier.remove()
+    remove_time = time.perf_counter() - start
+
+    return add_time, contains_time, remove_time
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,16 @@
+import argparse
 import csv
+import heapq
+import itertools
+import json
 import sys
 
-from util import Node, StackFrontier, QueueFrontier
+from landmarks import load_landmarks
+from loader import LoadReport, stream_stars
+from nameindex import NameIndex, split_birth
+from service import QueryEngine, run_batch, serve
+from snapshot import load_graph
+from util import Node, DequeQueueFrontier
 
 # Maps names to a set of corresponding person_ids
 names = {}
@@ -12,11 +21,20 @@ people = {}
 # Maps movie_ids to a dictionary of: title, year, stars (a set of person_ids)
 movies = {}
 
+# Prefix and fuzzy index over `names`, built by get_name_index when first needed
+name_index = None
 
-def load_data(directory):
+
+def load_data(directory, workers=0):
     """
     Load data from CSV files into memory.
+
+    stars.csv is streamed in chunks, parsed by `workers` processes if
+    given. Returns a LoadReport counting rows that refer to unknown
+    people or movies, which are skipped.
     """
+    global name_index
+
     # Load people
     with open(f"{directory}/people.csv", encoding="utf-8") as f:
         reader = csv.DictReader(f)
@@ -30,6 +48,7 @@ def load_data(directory):
                 names[row["name"].lower()] = {row["id"]}
             else:
                 names[row["name"].lower()].add(row["id"])
+    name_index = None
 
     # Load movies
     with open(f"{directory}/movies.csv", encoding="utf-8") as f:
@@ -42,55 +61,196 @@ def load_data(directory):
             }
 
     # Load stars
-    with open(f"{directory}/stars.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            try:
-                people[row["person_id"]]["movies"].add(row["movie_id"])
-                movies[row["movie_id"]]["stars"].add(row["person_id"])
-            except KeyError:
-                pass
+    report = LoadReport()
+    for chunk in stream_stars(f"{directory}/stars.csv", workers):
+        for person_id, movie_id in chunk:
+            person = people.get(person_id)
+            movie = movies.get(movie_id)
+            report.add(person is not None, movie is not None)
+            if person is not None and movie is not None:
+                person["movies"].add(movie_id)
+                movie["stars"].add(person_id)
+    report.finish()
+    return report
+
+
+def get_name_index():
+    """
+    Returns a NameIndex over `names`, building it the first time it is
+    needed, since that takes long for large datasets.
+    """
+    global name_index
+    if name_index is None:
+        name_index = NameIndex(names)
+    return name_index
 
 
 def main():
-    if len(sys.argv) > 2:
-        sys.exit("Usage: python degrees/degrees.py [directory]")
-    directory = sys.argv[1] if len(sys.argv) == 2 else "degrees/small"
+    parser = argparse.ArgumentParser(prog="python degrees/degrees.py")
+    parser.add_argument("directory", nargs="?", default="degrees/small")
+    parser.add_argument("--bidirectional", action="store_true",
+                        help="search from both people at the same time")
+    parser.add_argument("--backend", choices=["dict", "csr"], default="dict",
+                        help="graph representation to search")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="do not read or write the csr backend's snapshot")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="parse stars.csv with this many worker processes")
+    parser.add_argument("--landmarks", type=int, default=0, metavar="N",
+                        help="guide the csr backend's search with N precomputed landmarks")
+    parser.add_argument("--all-paths", action="store_true",
+                        help="list every shortest path instead of just one")
+    parser.add_argument("--k-paths", type=int, metavar="K",
+                        help="list the K shortest simple paths")
+    parser.add_argument("--complete", metavar="PREFIX",
+                        help="list names starting with PREFIX and exit")
+    parser.add_argument("--batch", metavar="FILE",
+                        help="answer 'source,target' lines from FILE ('-' for stdin) as JSON lines")
+    parser.add_argument("--serve", action="store_true",
+                        help="keep the graph loaded and answer queries over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8050)
+    args = parser.parse_args()
+    directory = args.directory
+    if args.landmarks and args.backend != "csr" and not (args.batch or args.serve):
+        parser.error("--landmarks requires --backend csr")
+    if args.k_paths is not None and args.k_paths < 1:
+        parser.error("--k-paths must be at least 1")
+    if args.all_paths or args.k_paths:
+        if args.backend != "dict":
+            parser.error("--all-paths and --k-paths require --backend dict")
+        if args.bidirectional:
+            parser.error("--all-paths and --k-paths cannot be combined with --bidirectional")
+        if args.all_paths and args.k_paths:
+            parser.error("--all-paths and --k-paths cannot be combined")
+
+    if args.batch or args.serve:
+        run_service(args)
+        return
 
     # Load data from files into memory
     print("Loading data...")
-    load_data(directory)
+    if args.backend == "csr":
+        graph = load_graph(directory, cache=not args.no_cache, workers=args.workers)
+        report = graph.load_report
+        find_person = graph.person_for_name
+        search = graph_search(graph, args)
+        person_name = graph.person_name
+        movie_title = graph.movie_title
+        get_index = graph.name_index
+    else:
+        report = load_data(directory, workers=args.workers)
+        find_person = person_id_for_name
+        get_index = get_name_index
+        if args.bidirectional:
+            search = bidirectional_shortest_path
+        else:
+            search = shortest_path
+        person_name = lambda person_id: people[person_id]["name"]
+        movie_title = lambda movie_id: movies[movie_id]["title"]
     print("Data loaded.")
+    if report is not None:
+        print(report)
 
-    source = person_id_for_name(input("Name: "))
+    if args.complete is not None:
+        for name, persons in get_index().complete(args.complete, limit=20):
+            print(f"{person_name(next(iter(persons)))} ({len(persons)})")
+        return
+
+    name = input("Name: ")
+    source = find_person(name)
     if source is None:
+        suggest_names(name, get_index(), person_name)
         sys.exit("Person not found.")
-    target = person_id_for_name(input("Name: "))
+    name = input("Name: ")
+    target = find_person(name)
     if target is None:
+        suggest_names(name, get_index(), person_name)
         sys.exit("Person not found.")
 
-    path = shortest_path(source, target)
+    if args.all_paths or args.k_paths:
+        if args.all_paths:
+            paths = all_shortest_paths(source, target)
+        else:
+            paths = itertools.islice(k_shortest_paths(source, target), args.k_paths)
+        count = 0
+        for count, path in enumerate(paths, 1):
+            print(f"Path {count}: {len(path)} degrees of separation.")
+            print_path(source, path, person_name, movie_title)
+        if count == 0:
+            print("Not connected.")
+        return
+
+    stats = {}
+    path = search(source, target, stats)
+    print(f"{stats['explored']} people explored.")
 
     if path is None:
         print("Not connected.")
     else:
-        degrees = len(path)
-        print(f"{degrees} degrees of separation.")
-        path = [(None, source)] + path
-        for i in range(degrees):
-            person1 = people[path[i][1]]["name"]
-            person2 = people[path[i + 1][1]]["name"]
-            movie = movies[path[i + 1][0]]["title"]
-            print(f"{i + 1}: {person1} and {person2} starred in {movie}")
+        print(f"{len(path)} degrees of separation.")
+        print_path(source, path, person_name, movie_title)
+
+
+def print_path(source, path, person_name, movie_title):
+    """
+    Print each step of a path of (movie, person) pairs starting at `source`.
+    """
+    path = [(None, source)] + path
+    for i in range(len(path) - 1):
+        person1 = person_name(path[i][1])
+        person2 = person_name(path[i + 1][1])
+        movie = movie_title(path[i + 1][0])
+        print(f"{i + 1}: {person1} and {person2} starred in {movie}")
 
 
-def shortest_path(source, target):
+def run_service(args):
+    """
+    Answer many queries against one loaded graph, in batch or server mode.
+    Batch results go to stdout; progress and latency go to stderr.
+    Both modes always use the csr backend.
+    """
+    print("Loading data...", file=sys.stderr)
+    graph = load_graph(args.directory, cache=not args.no_cache, workers=args.workers)
+    print("Data loaded.", file=sys.stderr)
+    if graph.load_report is not None:
+        print(graph.load_report, file=sys.stderr)
+    engine = QueryEngine(graph, graph_search(graph, args))
+
+    if args.serve:
+        serve(engine, args.host, args.port)
+    elif args.batch == "-":
+        run_batch(engine, sys.stdin, sys.stdout)
+    else:
+        with open(args.batch, encoding="utf-8", newline="") as f:
+            run_batch(engine, f, sys.stdout)
+
+    print(f"Latency: {json.dumps(engine.latency.summary())}", file=sys.stderr)
+
+
+def graph_search(graph, args):
+    """
+    Return the search function of the csr backend selected by `args`.
+    """
+    if args.landmarks:
+        return load_landmarks(graph, args.directory, args.landmarks).shortest_path
+    elif args.bidirectional:
+        return graph.bidirectional_shortest_path
+    else:
+        return graph.shortest_path
+
+
+def shortest_path(source, target, stats=None):
     """
     Returns the shortest list of (movie_id, person_id) pairs
     that connect the source to the target.
 
     If no possible path, returns None.
+    If `stats` is a dict, the number of explored people is stored
+    under its "explored" key.
     """
+    if stats is None:
+        stats = {}
 
     # Keep track of number of states explored
     num_explored = 0
@@ -99,7 +259,7 @@ def shortest_path(source, target):
     source_movies = people[source]["movies"]
     start = Node(source, None, source_movies)
 
-    frontier = QueueFrontier()
+    frontier = DequeQueueFrontier()
     frontier.add(start)
 
     # Initialize an empty explored set
@@ -110,11 +270,13 @@ def shortest_path(source, target):
 
         # If nothing left in frontier, then no path
         if frontier.empty():
+            stats["explored"] = num_explored
             return None
         
         # Chose a node from the frontier
         node = frontier.remove()
         num_explored += 1
+        stats["explored"] = num_explored
 
         # If node is a goal, then we have a solution
         if node.state == target:
@@ -137,15 +299,239 @@ def shortest_path(source, target):
                 frontier.add(child)
 
 
-def person_id_for_name(name):
+def bidirectional_shortest_path(source, target, stats=None):
+    """
+    Returns the shortest list of (movie_id, person_id) pairs
+    that connect the source to the target, growing one breadth-first
+    search from the source and one from the target until they meet.
+
+    If no possible path, returns None.
+    If `stats` is a dict, the number of explored people is stored
+    under its "explored" key.
+    """
+    if stats is None:
+        stats = {}
+    stats["explored"] = 0
+
+    if source == target:
+        return []
+
+    # Each side maps a reached person to the (movie_id, person_id) step
+    # that leads back towards the person its search started from
+    forward_parents = {source: None}
+    backward_parents = {target: None}
+    forward_frontier = [source]
+    backward_frontier = [target]
+
+    while forward_frontier and backward_frontier:
+
+        # Expand one whole level of the smaller side
+        if len(forward_frontier) <= len(backward_frontier):
+            forward_frontier, meeting = expand_level(
+                forward_frontier, forward_parents, backward_parents, stats)
+        else:
+            backward_frontier, meeting = expand_level(
+                backward_frontier, backward_parents, forward_parents, stats)
+
+        if meeting is not None:
+            return join_paths(meeting, forward_parents, backward_parents)
+
+    return None
+
+
+def expand_level(frontier, parents, other_parents, stats):
+    """
+    Expand every person in `frontier` by one step, recording new people
+    in `parents`. Returns the next frontier and the first person that is
+    already known to the other search, or None if the searches did not meet.
+    """
+    next_frontier = []
+    for person_id in frontier:
+        stats["explored"] += 1
+        for movie_id, neighbor_id in neighbors_for_person(person_id):
+            if neighbor_id in parents:
+                continue
+            parents[neighbor_id] = (movie_id, person_id)
+            if neighbor_id in other_parents:
+                return next_frontier, neighbor_id
+            next_frontier.append(neighbor_id)
+    return next_frontier, None
+
+
+def join_paths(meeting, forward_parents, backward_parents):
+    """
+    Join the two halves of a bidirectional search that met at `meeting`
+    into a single list of (movie_id, person_id) pairs.
+    """
+
+    # Walk back from the meeting person to the source
+    path = []
+    person_id = meeting
+    while forward_parents[person_id] is not None:
+        movie_id, parent_id = forward_parents[person_id]
+        path.append((movie_id, person_id))
+        person_id = parent_id
+    path.reverse()
+
+    # Walk forward from the meeting person to the target
+    person_id = meeting
+    while backward_parents[person_id] is not None:
+        movie_id, person_id = backward_parents[person_id]
+        path.append((movie_id, person_id))
+
+    return path
+
+
+def all_shortest_paths(source, target):
+    """
+    Yields every shortest list of (movie_id, person_id) pairs that
+    connects the source to the target, one at a time.
+
+    A breadth-first search records, for every person, all the
+    (movie_id, person_id) steps that reach them from the previous level.
+    Paths are then read off this predecessor DAG backwards from the target
+    with an explicit stack, so only one path is held in memory at a time.
+    """
+    if source == target:
+        yield []
+        return
+
+    # Maps each reached person to their depth and shortest-path predecessors
+    depth = {source: 0}
+    predecessors = {source: []}
+    frontier = [source]
+    while frontier and target not in depth:
+        next_frontier = []
+        for person_id in frontier:
+            for movie_id, neighbor_id in neighbors_for_person(person_id):
+                if neighbor_id not in depth:
+                    depth[neighbor_id] = depth[person_id] + 1
+                    predecessors[neighbor_id] = []
+                    next_frontier.append(neighbor_id)
+                if depth[neighbor_id] == depth[person_id] + 1:
+                    predecessors[neighbor_id].append((movie_id, person_id))
+        frontier = next_frontier
+
+    if target not in depth:
+        return
+
+    # Depth-first walk from the target; `path` holds the steps taken so far
+    # in reverse and `stack` the predecessors still to try at each step
+    path = []
+    stack = [iter(predecessors[target])]
+    person_id = target
+    while stack:
+        step = next(stack[-1], None)
+        if step is None:
+            stack.pop()
+            if path:
+                person_id = path.pop()[1]
+            continue
+
+        movie_id, parent_id = step
+        path.append((movie_id, person_id))
+        if parent_id == source:
+            yield path[::-1]
+            path.pop()
+        else:
+            person_id = parent_id
+            stack.append(iter(predecessors[parent_id]))
+
+
+def k_shortest_paths(source, target):
+    """
+    Yields simple lists of (movie_id, person_id) pairs that connect the
+    source to the target, shortest first, using Yen's algorithm.
+    Take as many as needed, e.g. with itertools.islice.
+    """
+    path = shortest_path_avoiding(source, target, set(), set())
+    if path is None:
+        return
+
+    found = [path]
+    seen = {tuple(path)}
+    candidates = []
+    counter = itertools.count()
+    while True:
+        yield path
+
+        # Branch off the last path at each of its people in turn
+        people_on_path = [source] + [person_id for _, person_id in path]
+        for i in range(len(path)):
+            spur = people_on_path[i]
+            root = path[:i]
+
+            # Steps out of the spur person already used by found paths
+            # with the same root may not be taken again
+            removed_steps = {p[i] for p in found if len(p) > i and p[:i] == root}
+            removed_people = set(people_on_path[:i])
+
+            spur_path = shortest_path_avoiding(
+                spur, target, removed_people, removed_steps)
+            if spur_path is None:
+                continue
+            candidate = root + spur_path
+            if tuple(candidate) not in seen:
+                seen.add(tuple(candidate))
+                heapq.heappush(candidates, (len(candidate), next(counter), candidate))
+
+        if not candidates:
+            return
+        _, _, path = heapq.heappop(candidates)
+        found.append(path)
+
+
+def shortest_path_avoiding(source, target, removed_people, removed_steps):
+    """
+    Returns the shortest list of (movie_id, person_id) pairs from the
+    source to the target that visits nobody in `removed_people` and does
+    not take any (movie_id, person_id) step in `removed_steps` out of the
+    source. If no such path, returns None.
+    """
+    if source == target:
+        return []
+
+    parents = {source: None}
+    frontier = [source]
+    while frontier:
+        next_frontier = []
+        for person_id in frontier:
+            for step in neighbors_for_person(person_id):
+                movie_id, neighbor_id = step
+                if neighbor_id in parents or neighbor_id in removed_people:
+                    continue
+                if person_id == source and step in removed_steps:
+                    continue
+                parents[neighbor_id] = (movie_id, person_id)
+                if neighbor_id == target:
+                    return join_paths(target, parents, {target: None})
+                next_frontier.append(neighbor_id)
+        frontier = next_frontier
+
+    return None
+
+
+def person_id_for_name(name, interactive=True):
     """
     Returns the IMDB id for a person's name,
     resolving ambiguities as needed.
+
+    A birth year after the name, as in "Chris Evans (1981)", picks between
+    people with the same name. If the name is still ambiguous and
+    `interactive` is false, returns None instead of prompting.
     """
+    name, birth = split_birth(name)
     person_ids = list(names.get(name.lower(), set()))
+    if birth is not None:
+        person_ids = [
+            person_id for person_id in person_ids
+            if people[person_id]["birth"] == birth
+        ]
     if len(person_ids) == 0:
         return None
     elif len(person_ids) > 1:
+        if not interactive:
+            return None
         print(f"Which '{name}'?")
         for person_id in person_ids:
             person = people[person_id]
@@ -163,6 +549,20 @@ def person_id_for_name(name):
         return person_ids[0]
 
 
+def suggest_names(name, index, person_name):
+    """
+    Print the known names closest to a name that was not found.
+    """
+    name = split_birth(name)[0]
+    if name.lower() in index.names:
+        return
+    suggestions = index.search(name, limit=5)
+    if suggestions:
+        print("Did you mean: " + ", ".join(
+            person_name(next(iter(persons))) for _, _, persons in suggestions
+        ) + "?")
+
+
 def neighbors_for_person(person_id):
     """
     Returns (movie_id, person_id) pairs for people
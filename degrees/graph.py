@@ -0,0 +1,332 @@
+import csv
+from array import array
+from bisect import bisect_left, bisect_right
+
+from loader import LoadReport, stream_stars
+from nameindex import NameIndex, split_birth
+
+
+class CompactGraph():
+    """
+    Person/movie graph stored as compressed sparse row (CSR) arrays.
+
+    People and movies are numbered with dense integers in the order they
+    appear in people.csv and movies.csv. The movies of person `i` are
+    `person_movies[person_offsets[i]:person_offsets[i + 1]]`, and the
+    people of movie `m` are `movie_people[movie_offsets[m]:movie_offsets[m + 1]]`.
+    Searches run on these integers only; IMDB ids, names and titles are
+    only looked up when a result is printed.
+    """
+
+    def __init__(self, person_ids, person_names, person_births,
+                 movie_ids, movie_titles, movie_years,
+                 person_offsets, person_movies, movie_offsets, movie_people,
+                 name_order=None):
+        self.person_ids = person_ids
+        self.person_names = person_names
+        self.person_births = person_births
+        self.movie_ids = movie_ids
+        self.movie_titles = movie_titles
+        self.movie_years = movie_years
+        self.person_offsets = person_offsets
+        self.person_movies = person_movies
+        self.movie_offsets = movie_offsets
+        self.movie_people = movie_people
+
+        # Person indices sorted by lowercase name, so that names can be
+        # looked up with a binary search instead of a dict of every name
+        if name_order is None:
+            name_order = array("i", sorted(
+                range(len(person_names)), key=lambda i: person_names[i].lower()))
+        self.name_order = name_order
+        self._name_index = None
+
+        # LoadReport for stars.csv when the graph was built from CSV files
+        self.load_report = None
+
+    @classmethod
+    def from_csv(cls, directory, workers=0):
+        """
+        Build a graph from people.csv, movies.csv and stars.csv in `directory`.
+        stars.csv is streamed in chunks, parsed by `workers` processes if
+        given; rows that refer to unknown people or movies are skipped and
+        counted in the graph's `load_report`.
+        """
+        person_ids, person_names, person_births = [], [], []
+        with open(f"{directory}/people.csv", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                person_ids.append(row["id"])
+                person_names.append(row["name"])
+                person_births.append(row["birth"])
+
+        movie_ids, movie_titles, movie_years = [], [], []
+        with open(f"{directory}/movies.csv", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                movie_ids.append(row["id"])
+                movie_titles.append(row["title"])
+                movie_years.append(row["year"])
+
+        person_index = {person_id: i for i, person_id in enumerate(person_ids)}
+        movie_index = {movie_id: i for i, movie_id in enumerate(movie_ids)}
+
+        # Collect stars as two parallel integer arrays
+        star_people = array("i")
+        star_movies = array("i")
+        report = LoadReport()
+        for chunk in stream_stars(f"{directory}/stars.csv", workers):
+            for person_id, movie_id in chunk:
+                person = person_index.get(person_id)
+                movie = movie_index.get(movie_id)
+                report.add(person is not None, movie is not None)
+                if person is not None and movie is not None:
+                    star_people.append(person)
+                    star_movies.append(movie)
+        report.finish()
+
+        person_offsets, person_movies = build_csr(
+            star_people, star_movies, len(person_ids))
+        movie_offsets, movie_people = build_csr(
+            star_movies, star_people, len(movie_ids))
+
+        graph = cls(person_ids, person_names, person_births,
+                    movie_ids, movie_titles, movie_years,
+                    person_offsets, person_movies, movie_offsets, movie_people)
+        graph.load_report = report
+        return graph
+
+    def movies_for_person(self, person):
+        return self.person_movies[self.person_offsets[person]:self.person_offsets[person + 1]]
+
+    def people_for_movie(self, movie):
+        return self.movie_people[self.movie_offsets[movie]:self.movie_offsets[movie + 1]]
+
+    def person_name(self, person):
+        return self.person_names[person]
+
+    def movie_title(self, movie):
+        return self.movie_titles[movie]
+
+    def persons_for_name(self, name):
+        """
+        Returns the indices of every person whose name matches `name`,
+        ignoring case.
+        """
+        name = name.lower()
+        key = lambda person: self.person_names[person].lower()
+        start = bisect_left(self.name_order, name, key=key)
+        end = bisect_right(self.name_order, name, lo=start, key=key)
+        return list(self.name_order[start:end])
+
+    def name_index(self):
+        """
+        Returns a NameIndex over every person's name, building it
+        the first time it is needed.
+        """
+        if self._name_index is None:
+            names = {}
+            for person in self.name_order:
+                names.setdefault(self.person_names[person].lower(), []).append(person)
+            self._name_index = NameIndex(names)
+        return self._name_index
+
+    def person_for_name(self, name, interactive=True):
+        """
+        Returns the person index for a name,
+        resolving ambiguities as needed.
+
+        A birth year after the name, as in "Chris Evans (1981)", picks between
+        people with the same name. If the name is still ambiguous and
+        `interactive` is false, returns None instead of prompting.
+        """
+        name, birth = split_birth(name)
+        persons = self.persons_for_name(name)
+        if birth is not None:
+            persons = [p for p in persons if self.person_births[p] == birth]
+        if len(persons) == 0:
+            return None
+        elif len(persons) > 1:
+            if not interactive:
+                return None
+            print(f"Which '{name}'?")
+            for person in persons:
+                print(f"ID: {self.person_ids[person]}, "
+                      f"Name: {self.person_names[person]}, "
+                      f"Birth: {self.person_births[person]}")
+            person_id = input("Intended Person ID: ")
+            for person in persons:
+                if self.person_ids[person] == person_id:
+                    return person
+            return None
+        else:
+            return persons[0]
+
+    def shortest_path(self, source, target, stats=None):
+        """
+        Returns the shortest list of (movie, person) index pairs
+        that connect the source to the target.
+
+        If no possible path, returns None.
+        If `stats` is a dict, the number of explored people is stored
+        under its "explored" key.
+        """
+        if stats is None:
+            stats = {}
+        stats["explored"] = 0
+
+        if source == target:
+            return []
+
+        # parent[p] is the person p was reached from and parent_movie[p]
+        # the movie they share; -1 means p has not been reached yet
+        parent = array("i", [-1]) * len(self.person_ids)
+        parent_movie = array("i", [-1]) * len(self.person_ids)
+        seen_movies = bytearray(len(self.movie_ids))
+        parent[source] = source
+
+        frontier = [source]
+        while frontier:
+            next_frontier = []
+            for person in frontier:
+                stats["explored"] += 1
+                for movie in self.movies_for_person(person):
+
+                    # Everyone in a movie is reached the first time it is seen
+                    if seen_movies[movie]:
+                        continue
+                    seen_movies[movie] = 1
+                    for neighbor in self.people_for_movie(movie):
+                        if parent[neighbor] == -1:
+                            parent[neighbor] = person
+                            parent_movie[neighbor] = movie
+                            if neighbor == target:
+                                return self.trace_path(parent, parent_movie, source, target)
+                            next_frontier.append(neighbor)
+            frontier = next_frontier
+
+        return None
+
+    def distances_from(self, source):
+        """
+        Returns an array with the degrees of separation between the source
+        and every person, using -1 for people who are not connected.
+        """
+        distance = array("i", [-1]) * len(self.person_ids)
+        seen_movies = bytearray(len(self.movie_ids))
+        distance[source] = 0
+
+        frontier = [source]
+        depth = 0
+        while frontier:
+            depth += 1
+            next_frontier = []
+            for person in frontier:
+                for movie in self.movies_for_person(person):
+                    if seen_movies[movie]:
+                        continue
+                    seen_movies[movie] = 1
+                    for neighbor in self.people_for_movie(movie):
+                        if distance[neighbor] == -1:
+                            distance[neighbor] = depth
+                            next_frontier.append(neighbor)
+            frontier = next_frontier
+
+        return distance
+
+    def bidirectional_shortest_path(self, source, target, stats=None):
+        """
+        Returns the shortest list of (movie, person) index pairs
+        that connect the source to the target, searching from both ends.
+
+        If no possible path, returns None.
+        If `stats` is a dict, the number of explored people is stored
+        under its "explored" key.
+        """
+        if stats is None:
+            stats = {}
+        stats["explored"] = 0
+
+        if source == target:
+            return []
+
+        size = len(self.person_ids)
+        forward_parent = array("i", [-1]) * size
+        forward_movie = array("i", [-1]) * size
+        backward_parent = array("i", [-1]) * size
+        backward_movie = array("i", [-1]) * size
+        forward_parent[source] = source
+        backward_parent[target] = target
+
+        forward_frontier = [source]
+        backward_frontier = [target]
+        while forward_frontier and backward_frontier:
+            if len(forward_frontier) <= len(backward_frontier):
+                forward_frontier, meeting = self._expand_level(
+                    forward_frontier, forward_parent, forward_movie,
+                    backward_parent, stats)
+            else:
+                backward_frontier, meeting = self._expand_level(
+                    backward_frontier, backward_parent, backward_movie,
+                    forward_parent, stats)
+
+            if meeting is not None:
+                path = self.trace_path(forward_parent, forward_movie, source, meeting)
+                person = meeting
+                while person != target:
+                    path.append((backward_movie[person], backward_parent[person]))
+                    person = backward_parent[person]
+                return path
+
+        return None
+
+    def _expand_level(self, frontier, parent, parent_movie, other_parent, stats):
+        """
+        Expand every person in `frontier` by one step. Returns the next
+        frontier and the first person already reached by the other search,
+        or None if the searches did not meet.
+        """
+        next_frontier = []
+        for person in frontier:
+            stats["explored"] += 1
+            for movie in self.movies_for_person(person):
+                for neighbor in self.people_for_movie(movie):
+                    if parent[neighbor] != -1:
+                        continue
+                    parent[neighbor] = person
+                    parent_movie[neighbor] = movie
+                    if other_parent[neighbor] != -1:
+                        return next_frontier, neighbor
+                    next_frontier.append(neighbor)
+        return next_frontier, None
+
+    def trace_path(self, parent, parent_movie, source, person):
+        """
+        Follow `parent` links from `person` back to `source` and return
+        the (movie, person) pairs in order from the source.
+        """
+        path = []
+        while person != source:
+            path.append((parent_movie[person], person))
+            person = parent[person]
+        path.reverse()
+        return path
+
+
+def build_csr(rows, columns, size):
+    """
+    Group `columns` by `rows` (two parallel integer arrays) into CSR form.
+    Returns `offsets`, with `size + 1` entries, and `values`, where the
+    values of row `r` are `values[offsets[r]:offsets[r + 1]]`.
+    """
+    offsets = array("q", [0]) * (size + 1)
+    for row in rows:
+        offsets[row + 1] += 1
+    for i in range(size):
+        offsets[i + 1] += offsets[i]
+
+    values = array("i", [0]) * len(columns)
+    position = array("q", offsets[:-1])
+    for row, column in zip(rows, columns):
+        values[position[row]] = column
+        position[row] += 1
+
+    return offsets, values
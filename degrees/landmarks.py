@@ -0,0 +1,218 @@
+import heapq
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from snapshot import data_signature
+
+# Name of the landmark index file written next to the CSV files
+LANDMARKS_NAME = "degrees.landmarks"
+
+MAGIC = b"DEGLMRK1"
+
+# Distances are stored in one byte each, with -1 for not connected
+UNREACHABLE = -1
+
+
+class LandmarkIndex():
+    """
+    Breadth-first distances from a few well-connected landmark people to
+    everyone else, used as lower bounds to guide an A* search (the ALT
+    technique: A*, landmarks and the triangle inequality).
+
+    For any landmark L, |d(L, target) - d(L, person)| <= d(person, target),
+    so the largest such difference never overestimates the remaining distance.
+    """
+
+    def __init__(self, graph, landmarks, distances):
+        self.graph = graph
+        self.landmarks = landmarks
+
+        # distances[k] holds the distance from landmark k to every person
+        self.distances = distances
+
+    @classmethod
+    def build(cls, graph, count):
+        """
+        Choose the `count` people with the most co-star links as landmarks
+        and run a breadth-first search from each of them.
+        """
+        degree = [0] * len(graph.person_ids)
+        for movie in range(len(graph.movie_ids)):
+            cast = graph.movie_offsets[movie + 1] - graph.movie_offsets[movie]
+            for person in graph.people_for_movie(movie):
+                degree[person] += cast - 1
+        landmarks = sorted(range(len(degree)), key=lambda p: -degree[p])[:count]
+
+        distances = []
+        for landmark in landmarks:
+            distance = graph.distances_from(landmark)
+
+            # Clamp to fit one byte; a smaller bound is still a lower bound
+            distances.append(array("b", (min(d, 127) for d in distance)))
+        return cls(graph, landmarks, distances)
+
+    def lower_bound(self, person, target):
+        """
+        Returns a lower bound on the degrees of separation between
+        `person` and `target`, or None if they are known not to be connected.
+        """
+        return self._bound(person, self._target_distances(target))
+
+    def _target_distances(self, target):
+        """
+        Returns (distances, distance to target) pairs for every landmark.
+        """
+        return [(distance, distance[target]) for distance in self.distances]
+
+    def _bound(self, person, target_distances):
+        bound = 0
+        for distance, to_target in target_distances:
+            to_person = distance[person]
+            if (to_person == UNREACHABLE) != (to_target == UNREACHABLE):
+                return None
+            if to_person != UNREACHABLE and abs(to_target - to_person) > bound:
+                bound = abs(to_target - to_person)
+        return bound
+
+    def shortest_path(self, source, target, stats=None):
+        """
+        Returns the shortest list of (movie, person) index pairs
+        that connect the source to the target, using A* search with
+        landmark lower bounds.
+
+        If no possible path, returns None.
+        If `stats` is a dict, the number of explored people is stored
+        under its "explored" key.
+        """
+        if stats is None:
+            stats = {}
+        stats["explored"] = 0
+
+        if source == target:
+            return []
+        target_distances = self._target_distances(target)
+        source_bound = self._bound(source, target_distances)
+        if source_bound is None:
+            return None
+
+        graph = self.graph
+        size = len(graph.person_ids)
+        parent = array("i", [-1]) * size
+        parent_movie = array("i", [-1]) * size
+        depth = array("i", [-1]) * size
+        closed = bytearray(size)
+        parent[source] = source
+        depth[source] = 0
+
+        # Bounds are computed once per person; -1 means not yet computed
+        # and -2 that the person is not connected to the target
+        bounds = array("b", [-1]) * size
+
+        # Entries are (depth + bound, -depth, person); deeper people win ties
+        frontier = [(source_bound, 0, source)]
+        while frontier:
+            _, negative_depth, person = heapq.heappop(frontier)
+            if closed[person] or -negative_depth != depth[person]:
+                continue
+            closed[person] = 1
+            stats["explored"] += 1
+
+            if person == target:
+                return graph.trace_path(parent, parent_movie, source, target)
+
+            next_depth = depth[person] + 1
+            for movie in graph.movies_for_person(person):
+                for neighbor in graph.people_for_movie(movie):
+                    if closed[neighbor]:
+                        continue
+                    if depth[neighbor] != -1 and depth[neighbor] <= next_depth:
+                        continue
+                    bound = bounds[neighbor]
+                    if bound == -1:
+                        bound = self._bound(neighbor, target_distances)
+                        bound = -2 if bound is None else bound
+                        bounds[neighbor] = bound
+                    if bound == -2:
+                        continue
+                    depth[neighbor] = next_depth
+                    parent[neighbor] = person
+                    parent_movie[neighbor] = movie
+                    heapq.heappush(
+                        frontier, (next_depth + bound, -next_depth, neighbor))
+
+        return None
+
+
+def load_landmarks(graph, directory, count):
+    """
+    Return a LandmarkIndex with `count` landmarks for the data in `directory`.
+    The index is memory-mapped from `directory` when one exists for the
+    current CSV files, and built and saved there otherwise.
+    """
+    path = os.path.join(directory, LANDMARKS_NAME)
+    signature = data_signature(directory)
+
+    index = read_landmarks(graph, path, signature, count)
+    if index is None:
+        index = LandmarkIndex.build(graph, count)
+        try:
+            write_landmarks(index, path, signature)
+        except OSError as e:
+            print(f"Could not write landmark index: {e}", file=sys.stderr)
+    return index
+
+
+def write_landmarks(index, path, signature):
+    """
+    Write `index` to `path` as a JSON header followed by one row of
+    one-byte distances per landmark.
+    """
+    header = json.dumps({
+        "signature": signature,
+        "people": len(index.graph.person_ids),
+        "landmarks": index.landmarks,
+    }).encode("utf-8")
+
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(header)))
+        f.write(header)
+        for distance in index.distances:
+            f.write(distance.tobytes())
+    os.replace(temporary, path)
+
+
+def read_landmarks(graph, path, signature, count):
+    """
+    Memory-map the landmark index at `path`. Return None if there is no
+    index, it was built from other data or with a different number of
+    landmarks.
+    """
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return None
+
+    with f:
+        if f.read(len(MAGIC)) != MAGIC:
+            return None
+        header_length, = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(header_length))
+        if (header["signature"] != signature
+                or header["people"] != len(graph.person_ids)
+                or len(header["landmarks"]) != count):
+            return None
+        data = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    start = len(MAGIC) + 8 + header_length
+    people = header["people"]
+    distances = [
+        data[start + k * people:start + (k + 1) * people].cast("b")
+        for k in range(count)
+    ]
+    return LandmarkIndex(graph, header["landmarks"], distances)
@@ -0,0 +1,117 @@
+import csv
+import io
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# Rows per chunk when stars.csv is read in this process
+CHUNK_ROWS = 100_000
+
+# Bytes per chunk when stars.csv is split between worker processes
+CHUNK_BYTES = 8 * 1024 * 1024
+
+
+class LoadReport():
+    """
+    Counts of the rows read from stars.csv, how many of them referred to
+    people or movies that do not exist, and how fast they were read.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.loaded = 0
+        self.dangling_people = 0
+        self.dangling_movies = 0
+        self.start = time.perf_counter()
+        self.seconds = 0
+
+    def add(self, has_person, has_movie):
+        self.rows += 1
+        if has_person and has_movie:
+            self.loaded += 1
+        if not has_person:
+            self.dangling_people += 1
+        if not has_movie:
+            self.dangling_movies += 1
+
+    def finish(self):
+        self.seconds = time.perf_counter() - self.start
+
+    def __str__(self):
+        rate = self.rows / self.seconds if self.seconds else 0
+        return (f"Loaded {self.loaded} of {self.rows} stars rows "
+                f"({self.dangling_people} unknown person ids, "
+                f"{self.dangling_movies} unknown movie ids) "
+                f"at {rate:,.0f} rows/s.")
+
+
+def stream_stars(path, workers=0):
+    """
+    Yield the (person_id, movie_id) rows of a stars.csv file in chunks,
+    so that the whole file is never held in memory.
+
+    With `workers` > 0 the file is split into byte ranges that are parsed
+    by that many worker processes. Chunks still arrive in file order and
+    at most two per worker are in flight at once.
+    """
+    if workers <= 0:
+        with open(path, encoding="utf-8", newline="") as f:
+            reader = csv.reader(f)
+            columns = column_indices(next(reader))
+            chunk = []
+            for row in reader:
+                if not row:
+                    continue
+                chunk.append((row[columns[0]], row[columns[1]]))
+                if len(chunk) == CHUNK_ROWS:
+                    yield chunk
+                    chunk = []
+            if chunk:
+                yield chunk
+        return
+
+    with open(path, "rb") as f:
+        header = f.readline()
+        start = f.tell()
+        size = os.fstat(f.fileno()).st_size
+    columns = column_indices(next(csv.reader([header.decode("utf-8")])))
+    ranges = [
+        (position, min(position + CHUNK_BYTES, size))
+        for position in range(start, size, CHUNK_BYTES)
+    ]
+
+    with ProcessPoolExecutor(workers) as executor:
+        pending = []
+        for byte_range in ranges:
+            pending.append(executor.submit(parse_range, path, *byte_range, columns))
+            if len(pending) >= 2 * workers:
+                yield pending.pop(0).result()
+        for future in pending:
+            yield future.result()
+
+
+def column_indices(header):
+    """
+    Return the positions of the person_id and movie_id columns.
+    """
+    return header.index("person_id"), header.index("movie_id")
+
+
+def parse_range(path, start, end, columns):
+    """
+    Parse the rows of `path` that begin between byte `start` and byte `end`.
+    A row that straddles `start` belongs to the previous range.
+    """
+    with open(path, "rb") as f:
+        f.seek(start - 1)
+        if f.read(1) != b"\n":
+            f.readline()
+        lines = []
+        while f.tell() < end:
+            line = f.readline()
+            if not line:
+                break
+            lines.append(line)
+
+    text = io.StringIO(b"".join(lines).decode("utf-8"), newline="")
+    return [(row[columns[0]], row[columns[1]]) for row in csv.reader(text) if row]
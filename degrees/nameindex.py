@@ -0,0 +1,143 @@
+import itertools
+import re
+from array import array
+from bisect import bisect_left
+from collections import Counter
+
+# Matches a trailing birth year used to pick between people with one name,
+# as in "Chris Evans (1981)"
+BIRTH_PATTERN = re.compile(r"^(.*?)\s*\((\d{4})\)\s*$")
+
+
+class NameIndex():
+    """
+    Prefix and typo-tolerant lookup over a dict that maps lowercase
+    names to the people who have them.
+
+    Prefix matches come from a binary search over the sorted names.
+    Fuzzy matches use a trigram index: one edit changes at most three
+    trigrams, so a name within `d` edits of the query shares all but at
+    most `3d` of the query's trigrams. Only names that pass this count
+    filter are compared with the query by edit distance. Queries too
+    short for the filter to need any shared trigram are compared with
+    every name of a close enough length instead.
+    """
+
+    def __init__(self, names):
+        self.names = names
+        self.sorted_names = sorted(names)
+
+        # Maps each trigram to the positions in sorted_names that contain it
+        self.trigrams = {}
+        for position, name in enumerate(self.sorted_names):
+            for trigram in set(trigrams(name)):
+                postings = self.trigrams.get(trigram)
+                if postings is None:
+                    postings = self.trigrams[trigram] = array("i")
+                postings.append(position)
+
+        # Maps each length to the positions in sorted_names of that length
+        self.lengths = {}
+        for position, name in enumerate(self.sorted_names):
+            positions = self.lengths.get(len(name))
+            if positions is None:
+                positions = self.lengths[len(name)] = array("i")
+            positions.append(position)
+
+    def complete(self, prefix, limit=10):
+        """
+        Return up to `limit` (name, people) pairs whose name starts with
+        `prefix`, in alphabetical order.
+        """
+        prefix = prefix.lower()
+        matches = []
+        position = bisect_left(self.sorted_names, prefix)
+        while (position < len(self.sorted_names) and len(matches) < limit
+               and self.sorted_names[position].startswith(prefix)):
+            name = self.sorted_names[position]
+            matches.append((name, self.names[name]))
+            position += 1
+        return matches
+
+    def search(self, query, limit=10, max_distance=2):
+        """
+        Return up to `limit` (distance, name, people) triples for the names
+        within `max_distance` edits of `query`, closest first.
+        """
+        query = query.lower()
+        if query in self.names:
+            exact = [(0, query, self.names[query])]
+            if limit == 1 or max_distance == 0:
+                return exact
+        else:
+            exact = []
+
+        query_trigrams = set(trigrams(query))
+        required = len(query_trigrams) - 3 * max_distance
+        if required > 0:
+            shared = Counter()
+            for trigram in query_trigrams:
+                shared.update(self.trigrams.get(trigram, ()))
+            candidates = [position for position, count in shared.items() if count >= required]
+        else:
+            # Names sharing no trigram with a short query can still be close
+            candidates = itertools.chain.from_iterable(
+                self.lengths.get(length, ())
+                for length in range(len(query) - max_distance, len(query) + max_distance + 1))
+
+        matches = exact
+        for position in candidates:
+            name = self.sorted_names[position]
+            if name == query or abs(len(name) - len(query)) > max_distance:
+                continue
+            distance = edit_distance(query, name, max_distance)
+            if distance is not None:
+                matches.append((distance, name, self.names[name]))
+
+        matches.sort(key=lambda match: (match[0], match[1]))
+        return matches[:limit]
+
+
+def trigrams(name):
+    """
+    Return the trigrams of `name`, padded so that the start and end of
+    the name count as well.
+    """
+    padded = f"$${name}$"
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+def edit_distance(a, b, max_distance):
+    """
+    Return the Levenshtein distance between `a` and `b`, or None if it
+    is larger than `max_distance`. Only cells within `max_distance` of
+    the diagonal can stay under the limit, so only those are computed.
+    """
+    limit = max_distance + 1
+    previous = [j if j < limit else limit for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        current = [limit] * (len(b) + 1)
+        current[0] = i if i < limit else limit
+        char_a = a[i - 1]
+        for j in range(max(1, i - max_distance), min(len(b), i + max_distance) + 1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_a != b[j - 1]),
+                limit,
+            )
+        if min(current) >= limit:
+            return None
+        previous = current
+    return previous[-1] if previous[-1] <= max_distance else None
+
+
+def split_birth(name):
+    """
+    Split a trailing birth year off `name`, as in "Chris Evans (1981)".
+    Return the name and the year, or None when there is no year.
+    """
+    match = BIRTH_PATTERN.match(name)
+    if match:
+        return match.group(1), match.group(2)
+    return name, None
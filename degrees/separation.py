@@ -0,0 +1,108 @@
+import argparse
+import random
+import time
+from collections import Counter
+from multiprocessing import Pool, cpu_count
+
+from snapshot import load_graph
+
+# Graph loaded once in each worker process
+graph = None
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python degrees/separation.py",
+        description="Degrees of separation statistics over the whole graph.")
+    parser.add_argument("directory", nargs="?", default="degrees/small")
+    parser.add_argument("--sample", type=int,
+                        help="only use this many randomly chosen source people")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="random seed for --sample")
+    parser.add_argument("--workers", type=int, default=cpu_count(),
+                        help="number of worker processes")
+    args = parser.parse_args()
+
+    # Build the snapshot up front so every worker can memory-map it
+    print("Loading data...")
+    people = len(load_graph(args.directory).person_ids)
+    print("Data loaded.")
+
+    sources = range(people)
+    if args.sample is not None and args.sample < people:
+        sources = sorted(random.Random(args.seed).sample(sources, args.sample))
+
+    start = time.perf_counter()
+    totals = separation_distribution(args.directory, sources, args.workers)
+    seconds = time.perf_counter() - start
+
+    print_report(totals)
+    print(f"{totals['sources']} sources in {seconds:.1f}s "
+          f"with {args.workers} workers.")
+
+
+def init_worker(directory):
+    global graph
+    graph = load_graph(directory)
+
+
+def source_summary(source):
+    """
+    Run a single-source search from `source` and reduce it to the counts
+    of people at each distance and the source's eccentricity.
+    """
+    counts = Counter(graph.distances_from(source))
+    unreachable = counts.pop(-1, 0)
+    counts.pop(0, None)
+    eccentricity = max(counts) if counts else 0
+    return counts, eccentricity, unreachable
+
+
+def separation_distribution(directory, sources, workers):
+    """
+    Shard `sources` across a pool of `workers` processes and aggregate
+    the distance histogram, eccentricity histogram and unreachable count.
+    Per-source results are merged as they arrive and then discarded,
+    so memory does not grow with the number of sources.
+    """
+    totals = {
+        "sources": 0,
+        "distances": Counter(),
+        "eccentricities": Counter(),
+        "unreachable": 0,
+    }
+    with Pool(workers, initializer=init_worker, initargs=(directory,)) as pool:
+        chunksize = max(1, min(64, len(sources) // (workers * 8)))
+        for counts, eccentricity, unreachable in pool.imap_unordered(
+                source_summary, sources, chunksize=chunksize):
+            totals["sources"] += 1
+            totals["distances"].update(counts)
+            totals["eccentricities"][eccentricity] += 1
+            totals["unreachable"] += unreachable
+    return totals
+
+
+def print_report(totals):
+    distances = totals["distances"]
+    pairs = sum(distances.values())
+    if pairs == 0:
+        print("No connected pairs.")
+        return
+
+    average = sum(d * count for d, count in distances.items()) / pairs
+    print(f"Average degrees of separation: {average:.3f} "
+          f"over {pairs} connected pairs ({totals['unreachable']} not connected).")
+    print(f"Largest eccentricity (diameter lower bound): "
+          f"{max(totals['eccentricities'])}")
+
+    print("Degrees of separation:")
+    for d in sorted(distances):
+        print(f"  {d}: {distances[d]} ({distances[d] / pairs:.2%})")
+
+    print("Eccentricity:")
+    for e in sorted(totals["eccentricities"]):
+        print(f"  {e}: {totals['eccentricities'][e]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+import csv
+import json
+import math
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from nameindex import split_birth
+
+PERCENTILES = [50, 90, 99]
+
+
+class LatencyRecorder():
+    """
+    Collects query latencies and summarizes them as percentiles.
+    """
+
+    def __init__(self):
+        self.latencies = []
+
+    def add(self, seconds):
+        self.latencies.append(seconds)
+
+    def summary(self):
+        """
+        Return the number of queries and the nearest-rank percentiles
+        and maximum of their latencies in milliseconds.
+        """
+        latencies = sorted(self.latencies)
+        summary = {"queries": len(latencies)}
+        if not latencies:
+            return summary
+        for percentile in PERCENTILES:
+            rank = math.ceil(percentile / 100 * len(latencies))
+            summary[f"p{percentile}_ms"] = round(latencies[rank - 1] * 1000, 3)
+        summary["max_ms"] = round(latencies[-1] * 1000, 3)
+        return summary
+
+
+class QueryEngine():
+    """
+    Answers degrees-of-separation queries by name on a resident CompactGraph.
+    """
+
+    def __init__(self, graph, search):
+        self.graph = graph
+
+        # Search function taking (source, target, stats) person indices
+        self.search = search
+        self.latency = LatencyRecorder()
+
+    def query(self, source_name, target_name):
+        """
+        Return the result of a query as a JSON-serializable dict. Names
+        that match nobody or more than one person are reported as errors
+        instead of prompting for a choice.
+        """
+        start = time.perf_counter()
+        result = {"source": source_name, "target": target_name}
+
+        source = self.resolve(source_name, result)
+        target = self.resolve(target_name, result) if source is not None else None
+        if source is not None and target is not None:
+            stats = {}
+            path = self.search(source, target, stats)
+            result["explored"] = stats["explored"]
+            if path is None:
+                result["degrees"] = None
+            else:
+                result["degrees"] = len(path)
+                result["path"] = self.describe(source, path)
+
+        seconds = time.perf_counter() - start
+        self.latency.add(seconds)
+        result["latency_ms"] = round(seconds * 1000, 3)
+        return result
+
+    def resolve(self, name, result):
+        """
+        Return the person index for `name`, or None after recording
+        an error in `result`. A birth year after the name, as in
+        "Chris Evans (1981)", picks between people with the same name.
+        """
+        name, birth = split_birth(name)
+        persons = self.graph.persons_for_name(name)
+        if birth is not None:
+            persons = [p for p in persons if self.graph.person_births[p] == birth]
+        if len(persons) == 1:
+            return persons[0]
+        if len(persons) == 0:
+            result["error"] = f"Person not found: {name}"
+            result["suggestions"] = [
+                self.graph.person_name(matches[0])
+                for _, _, matches in self.graph.name_index().search(name, limit=5)
+            ]
+        else:
+            result["error"] = f"Ambiguous name: {name}"
+            result["candidates"] = [
+                {"id": self.graph.person_ids[person],
+                 "birth": self.graph.person_births[person]}
+                for person in persons
+            ]
+        return None
+
+    def complete(self, prefix, limit=10):
+        """
+        Return up to `limit` names starting with `prefix`.
+        """
+        return [
+            {"name": self.graph.person_name(matches[0]), "people": len(matches)}
+            for _, matches in self.graph.name_index().complete(prefix, limit)
+        ]
+
+    def describe(self, source, path):
+        """
+        Translate a path of (movie, person) indices into names and titles.
+        """
+        steps = []
+        previous = source
+        for movie, person in path:
+            steps.append({
+                "person1": self.graph.person_name(previous),
+                "person2": self.graph.person_name(person),
+                "movie": self.graph.movie_title(movie),
+            })
+            previous = person
+        return steps
+
+
+def run_batch(engine, infile, outfile):
+    """
+    Answer every `source,target` pair in `infile`, writing one JSON
+    result per line to `outfile`.
+    """
+    for row in csv.reader(infile):
+        if not row or not "".join(row).strip():
+            continue
+        if len(row) != 2:
+            result = {"error": f"Expected 'source,target', got: {','.join(row)}"}
+        else:
+            result = engine.query(row[0].strip(), row[1].strip())
+        outfile.write(json.dumps(result) + "\n")
+        outfile.flush()
+
+
+def serve(engine, host, port):
+    """
+    Serve queries over HTTP until interrupted:
+        GET /path?source=NAME&target=NAME answers a query,
+        GET /complete?prefix=PREFIX lists matching names,
+        GET /stats reports latency percentiles.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            params = parse_qs(url.query)
+            if url.path == "/path":
+                if "source" not in params or "target" not in params:
+                    self.respond(400, {"error": "source and target are required"})
+                else:
+                    self.respond(200, engine.query(
+                        params["source"][0], params["target"][0]))
+            elif url.path == "/complete":
+                prefix = params.get("prefix", [""])[0]
+                self.respond(200, engine.complete(prefix))
+            elif url.path == "/stats":
+                self.respond(200, engine.latency.summary())
+            else:
+                self.respond(404, {"error": "Not found"})
+
+        def respond(self, status, body):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = HTTPServer((host, port), Handler)
+    print(f"Serving on http://{host}:{server.server_port}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
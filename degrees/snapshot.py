@@ -0,0 +1,173 @@
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from graph import CompactGraph
+
+# Name of the snapshot file written next to the CSV files
+SNAPSHOT_NAME = "degrees.snapshot"
+
+MAGIC = b"DEGSNAP1"
+
+CSV_FILES = ["people.csv", "movies.csv", "stars.csv"]
+
+INTEGER_FIELDS = [
+    "person_offsets", "person_movies",
+    "movie_offsets", "movie_people",
+    "name_order",
+]
+
+STRING_FIELDS = [
+    "person_ids", "person_names", "person_births",
+    "movie_ids", "movie_titles", "movie_years",
+]
+
+
+class StringTable():
+    """
+    Read-only sequence of strings stored as one UTF-8 blob plus an array
+    of offsets, where string `i` is `blob[offsets[i]:offsets[i + 1]]`.
+    Strings are only decoded when they are accessed.
+    """
+
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        return str(self.blob[self.offsets[index]:self.offsets[index + 1]], "utf-8")
+
+
+def load_graph(directory, cache=True, workers=0):
+    """
+    Return a CompactGraph for the CSV files in `directory`.
+
+    If `cache` is true, a snapshot of the graph is memory-mapped from
+    `directory` when one exists for the current CSV files, and written
+    after parsing the CSV files otherwise. `workers` is passed on to
+    CompactGraph.from_csv.
+    """
+    path = os.path.join(directory, SNAPSHOT_NAME)
+    signature = data_signature(directory)
+
+    if cache:
+        graph = read_snapshot(path, signature)
+        if graph is not None:
+            return graph
+
+    graph = CompactGraph.from_csv(directory, workers)
+    if cache:
+        try:
+            write_snapshot(graph, path, signature)
+        except OSError as e:
+            print(f"Could not write snapshot: {e}", file=sys.stderr)
+    return graph
+
+
+def data_signature(directory):
+    """
+    Return the size and modification time of each CSV file, which
+    identify the data a snapshot was built from.
+    """
+    signature = []
+    for filename in CSV_FILES:
+        stat = os.stat(os.path.join(directory, filename))
+        signature.append([filename, stat.st_size, stat.st_mtime_ns])
+    return signature
+
+
+def write_snapshot(graph, path, signature):
+    """
+    Write `graph` to `path` as a JSON header followed by the raw
+    integer arrays and string tables, each aligned to 8 bytes.
+    """
+    sections = {}
+    chunks = []
+    position = 0
+
+    def add(name, data):
+        nonlocal position
+        padding = -position % 8
+        chunks.append(b"\0" * padding)
+        position += padding
+        sections[name] = [position, len(data)]
+        chunks.append(data)
+        position += len(data)
+
+    for field in INTEGER_FIELDS:
+        values = getattr(graph, field)
+        typecode = "q" if field.endswith("offsets") else "i"
+        add(field, array(typecode, values).tobytes())
+
+    for field in STRING_FIELDS:
+        blob, offsets = bytearray(), array("q", [0])
+        for value in getattr(graph, field):
+            blob += value.encode("utf-8")
+            offsets.append(len(blob))
+        add(f"{field}.blob", bytes(blob))
+        add(f"{field}.offsets", offsets.tobytes())
+
+    header = json.dumps({
+        "signature": signature,
+        "byteorder": sys.byteorder,
+        "sections": sections,
+    }).encode("utf-8")
+
+    # Sections are stored relative to the end of the header
+    start = len(MAGIC) + 8 + len(header)
+    header_padding = -start % 8
+
+    # Write to a temporary file first so readers never see half a snapshot
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(header) + header_padding))
+        f.write(header + b" " * header_padding)
+        for chunk in chunks:
+            f.write(chunk)
+    os.replace(temporary, path)
+
+
+def read_snapshot(path, signature):
+    """
+    Memory-map the snapshot at `path` and return it as a CompactGraph.
+    Return None if there is no snapshot or it was built from other data.
+    """
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return None
+
+    with f:
+        if f.read(len(MAGIC)) != MAGIC:
+            return None
+        header_length, = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(header_length))
+        if header["signature"] != signature or header["byteorder"] != sys.byteorder:
+            return None
+
+        # The mapping stays valid after the file is closed
+        data = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    start = len(MAGIC) + 8 + header_length
+
+    def section(name):
+        offset, length = header["sections"][name]
+        return data[start + offset:start + offset + length]
+
+    fields = {}
+    for field in INTEGER_FIELDS:
+        fields[field] = section(field).cast("q" if field.endswith("offsets") else "i")
+    for field in STRING_FIELDS:
+        fields[field] = StringTable(
+            section(f"{field}.blob"), section(f"{field}.offsets").cast("q"))
+
+    return CompactGraph(**fields)
@@ -1,3 +1,6 @@
+from collections import deque
+
+
 class Node():
     def __init__(self, state, parent, action):
         self.state = state
@@ -35,4 +38,52 @@ class QueueFrontier(StackFrontier):
         else:
             node = self.frontier[0]
             self.frontier = self.frontier[1:]
-            return node
\ No newline at end of file
+            return node
+
+
+class DequeStackFrontier():
+    """
+    Stack frontier backed by a deque, with a hash index of the states
+    it holds so that `contains_state` is O(1) instead of a list scan.
+    """
+
+    def __init__(self):
+        self.frontier = deque()
+        self.states = {}
+
+    def add(self, node):
+        self.frontier.append(node)
+        self.states[node.state] = self.states.get(node.state, 0) + 1
+
+    def contains_state(self, state):
+        return state in self.states
+
+    def empty(self):
+        return len(self.frontier) == 0
+
+    def _forget(self, node):
+        # The same state can be added more than once, so keep a count
+        count = self.states[node.state] - 1
+        if count == 0:
+            del self.states[node.state]
+        else:
+            self.states[node.state] = count
+
+    def remove(self):
+        if self.empty():
+            raise Exception("empty frontier")
+        else:
+            node = self.frontier.pop()
+            self._forget(node)
+            return node
+
+
+class DequeQueueFrontier(DequeStackFrontier):
+
+    def remove(self):
+        if self.empty():
+            raise Exception("empty frontier")
+        else:
+            node = self.frontier.popleft()
+            self._forget(node)
+            return node
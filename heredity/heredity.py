@@ -1,3 +1,4 @@
+import argparse
 import csv
 import itertools
 import sys
@@ -40,9 +41,55 @@ PROBS = {
 def main():
 
     # Check for proper usage
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python heredity/heredity.py heredity/data.csv")
-    people = load_data(sys.argv[1])
+    parser = argparse.ArgumentParser(prog="python heredity/heredity.py")
+    parser.add_argument("data", help="CSV file with the family, such as heredity/data/family0.csv")
+    parser.add_argument("--method", choices=["enumerate", "pruned", "vectorized", "elimination",
+                                             "likelihood", "gibbs"],
+                        default="enumerate",
+                        help="enumerate every joint assignment (in Python or with NumPy), "
+                             "enumerate only genes, run exact junction-tree inference, "
+                             "or approximate by likelihood weighting or Gibbs sampling")
+    parser.add_argument("--samples", type=int, default=10000,
+                        help="number of samples (likelihood) or sweeps (gibbs)")
+    parser.add_argument("--seed", type=int, default=None, help="random seed of the samplers")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="number of processes sampling in parallel")
+    args = parser.parse_args()
+    people = load_data(args.data)
+
+    if args.method == "pruned":
+        probabilities = pruned_probabilities(people)
+    elif args.method == "vectorized":
+        from vectorized import vectorized_probabilities
+        probabilities = vectorized_probabilities(people)
+    elif args.method == "elimination":
+        from inference import junction_tree_probabilities
+        probabilities = junction_tree_probabilities(people)
+    elif args.method in ("likelihood", "gibbs"):
+        from sampling import print_progress, sample_probabilities
+        probabilities, error = sample_probabilities(
+            people, args.method, args.samples, args.seed, args.workers, report=print_progress)
+        if error is not None:
+            print(f"Largest standard error: {error:.4f}", file=sys.stderr)
+    else:
+        probabilities = enumerate_probabilities(people)
+
+    # Print results
+    for person in people:
+        print(f"{person}:")
+        for field in probabilities[person]:
+            print(f"  {field.capitalize()}:")
+            for value in probabilities[person][field]:
+                p = probabilities[person][field][value]
+                print(f"    {value}: {p:.4f}")
+
+
+def enumerate_probabilities(people):
+    """
+    Return the gene and trait probabilities of every person by summing
+    `joint_probability` over every assignment of genes and traits that
+    agrees with the known traits.
+    """
 
     # Keep track of gene and trait probabilities for each person
     probabilities = {
@@ -62,6 +109,7 @@ def main():
 
     # Loop over all sets of people who might have the trait
     names = set(people)
+    family = Family(people)
     for have_trait in powerset(names):
 
         # Check if current set of people violates known information
@@ -74,24 +122,87 @@ def main():
             continue
 
         # Loop over all sets of people who might have the gene
+        traits = family.encode_traits(have_trait)
         for one_gene in powerset(names):
             for two_genes in powerset(names - one_gene):
 
                 # Update probabilities with new joint probability
-                p = joint_probability(people, one_gene, two_genes, have_trait)
+                p = family.joint_probability(family.encode_genes(one_gene, two_genes), traits)
                 update(probabilities, one_gene, two_genes, have_trait, p)
 
     # Ensure probabilities sum to 1
     normalize(probabilities)
+    return probabilities
 
-    # Print results
-    for person in people:
-        print(f"{person}:")
-        for field in probabilities[person]:
-            print(f"  {field.capitalize()}:")
-            for value in probabilities[person][field]:
-                p = probabilities[person][field][value]
-                print(f"    {value}: {p:.4f}")
+
+def pruned_probabilities(people):
+    """
+    Return the gene and trait probabilities of every person by exact
+    enumeration, like `enumerate_probabilities`, without enumerating
+    traits.
+
+    Known traits are fixed from the start. An unknown trait does not
+    change the probability of anyone's genes, because summing a person's
+    trait probability over both traits gives 1, so only gene assignments
+    are enumerated, and the probability of an unknown trait is added up
+    from each assignment's probability and the person's gene count.
+    """
+    family = Family(people)
+    n = len(family.names)
+    gene_totals = [[0, 0, 0] for _ in range(n)]
+    trait_totals = [0] * n
+    for genes, p in weighted_gene_assignments(family):
+        for i, gene in enumerate(genes):
+            gene_totals[i][gene] += p
+            trait_totals[i] += p * TRAIT[gene][1]
+
+    probabilities = {}
+    for i, name in enumerate(family.names):
+        total = sum(gene_totals[i])
+        trait = family.traits[i]
+        have_trait = trait_totals[i] / total if trait is None else int(trait)
+        probabilities[name] = {
+            "gene": {gene: gene_totals[i][gene] / total for gene in (2, 1, 0)},
+            "trait": {True: have_trait, False: 1 - have_trait},
+        }
+    return probabilities
+
+
+def weighted_gene_assignments(family):
+    """
+    Generate every assignment of gene counts to the people of `family`
+    that is possible given the known traits, with its probability
+    (the joint probability with the known traits, summed over the
+    unknown ones). The same list is yielded each time with new values.
+
+    People are given gene counts one at a time, parents before their
+    children, so each person's factor is multiplied in once for all the
+    assignments that share the gene counts of the people before them,
+    and assignments are dropped as soon as their probability is 0.
+    """
+    order = family.parents_first()
+    genes = [0] * len(order)
+
+    def extend(k, probability):
+        if k == len(order):
+            yield genes, probability
+            return
+        i = order[k]
+        mother = family.mothers[i]
+        father = family.fathers[i]
+        trait = family.traits[i]
+        for gene in range(3):
+            if mother < 0 or father < 0:
+                factor = GENE[gene]
+            else:
+                factor = INHERITANCE[genes[mother]][genes[father]][gene]
+            if trait is not None:
+                factor *= TRAIT[gene][trait]
+            if factor:
+                genes[i] = gene
+                yield from extend(k + 1, probability * factor)
+
+    yield from extend(0, 1)
 
 
 def load_data(filename):
@@ -138,36 +249,78 @@ def joint_probability(people, one_gene, two_genes, have_trait):
         * everyone not in `one_gene` or `two_gene` does not have the gene, and
         * everyone in set `have_trait` has the trait, and
         * everyone not in set` have_trait` does not have the trait.
+
+    Every call builds a `Family` from `people`, which takes time linear
+    in the number of people. Callers looping over many assignments of
+    the same family should build one `Family` and call its
+    `joint_probability` instead, as `enumerate_probabilities` does.
     """
+    family = Family(people)
+    return family.joint_probability(
+        family.encode_genes(one_gene, two_genes), family.encode_traits(have_trait))
 
-    # P(zero_genes, one_gene, two_genes, no_traits, have_traits)
-
-    zero_genes = set(
-        [person for person in people if person not in one_gene and person not in two_genes])
-    no_traits = set([person for person in people if person not in have_trait])
-    
-    probability = 1
-    for person in zero_genes:
-        probability = probability * get_probability_of_person_has_gene(
-            people=people, person=person, gene=0, one_gene=one_gene, two_genes=two_genes, zero_genes=zero_genes)
-    
-    for person in one_gene:
-        probability = probability * get_probability_of_person_has_gene(
-            people=people, person=person, gene=1, one_gene=one_gene, two_genes=two_genes, zero_genes=zero_genes)
-        
-    for person in two_genes:
-        probability = probability * get_probability_of_person_has_gene(
-            people=people, person=person, gene=2, one_gene=one_gene, two_genes=two_genes, zero_genes=zero_genes)
-        
-    for person in no_traits:
-        probability = probability * get_probability_of_person_has_trait(
-            people=people, person=person, trait=False, zero_genes=zero_genes, one_gene=one_gene, two_genes=two_genes)
-    
-    for person in have_trait:
-        probability = probability * get_probability_of_person_has_trait(
-            people=people, person=person, trait=True, zero_genes=zero_genes, one_gene=one_gene, two_genes=two_genes)
-    
-    return probability
+
+class Family():
+    """
+    People of a family numbered in the order of `people`, with the
+    numbers of their parents (-1 when unknown) and their known traits,
+    so that gene and trait assignments can be stored as lists of
+    integers and their probabilities found by table lookups.
+    """
+
+    def __init__(self, people):
+        self.names = list(people)
+        index = {name: i for i, name in enumerate(self.names)}
+        self.mothers = [index.get(people[name]["mother"], -1) for name in self.names]
+        self.fathers = [index.get(people[name]["father"], -1) for name in self.names]
+        self.traits = [people[name]["trait"] for name in self.names]
+
+    def encode_genes(self, one_gene, two_genes):
+        """
+        Return the number of copies of the gene of each person.
+        """
+        return [2 if name in two_genes else 1 if name in one_gene else 0 for name in self.names]
+
+    def encode_traits(self, have_trait):
+        """
+        Return 1 for each person who has the trait and 0 for the others.
+        """
+        return [int(name in have_trait) for name in self.names]
+
+    def joint_probability(self, genes, traits):
+        """
+        Return the joint probability of the gene counts `genes` and the
+        traits `traits`, encoded by `encode_genes` and `encode_traits`.
+        """
+        probability = 1
+        for i, gene in enumerate(genes):
+            mother = self.mothers[i]
+            father = self.fathers[i]
+            if mother < 0 or father < 0:
+                probability *= GENE[gene]
+            else:
+                probability *= INHERITANCE[genes[mother]][genes[father]][gene]
+            probability *= TRAIT[gene][traits[i]]
+        return probability
+
+    def parents_first(self):
+        """
+        Return the numbers of all people, with parents before their children.
+        """
+        order = []
+        placed = set()
+
+        def place(i):
+            if i < 0 or i in placed:
+                return
+            placed.add(i)
+            place(self.mothers[i])
+            place(self.fathers[i])
+            order.append(i)
+
+        for i in range(len(self.names)):
+            place(i)
+        return order
 
 
 def get_joint_child_gene_probability_by_mother_father(mother_gene, father_gene, child_gene, mutation):
@@ -258,58 +411,29 @@ def get_joint_child_gene_probability_by_mother_father(mother_gene, father_gene,
     return probability
 
 
-def get_probability_of_person_has_gene(people, person, gene, one_gene, two_genes, zero_genes):
-    # does this person is dependent variable ? -> does this person have father or mother?
-    probability_of_person_has_certain_gene = 1
-    mother = people[person]["mother"]
-    father = people[person]["father"]
-    if mother or father:
-        # according bayesian network probability_of_person_has_certain_gene = 
-        # = P(person = gene | mother(person) = motherGene, father(person) = fatherGene)
-
-        if mother in zero_genes:
-            mother_gene = 0
-        elif mother in one_gene:
-            mother_gene = 1
-        elif mother in two_genes:
-            mother_gene = 2
-        else:
-            mother_gene = None
-        
-        if father in zero_genes:
-            father_gene = 0
-        elif father in one_gene:
-            father_gene = 1
-        elif father in two_genes:
-            father_gene = 2
-        else:
-            father_gene = None
-        
-        # get P(person = gene | mother(person) = motherGene, father(person) = fatherGene)
-        probability_of_person_has_certain_gene = get_joint_child_gene_probability_by_mother_father(
-            mother_gene=mother_gene, father_gene=father_gene, child_gene=gene, mutation=PROBS['mutation'])
-
-    # our data does not contain information about person's father or mother,
-    # so according bayesian network it is independent variable,
-    # thus probability of this is not dependent on other variables
-    else:
-        probability_of_person_has_certain_gene = PROBS['gene'][gene]
-    
-    return probability_of_person_has_certain_gene
-
+def inheritance_table(mutation):
+    """
+    Return the table `table[mother_gene][father_gene][child_gene]` of the
+    probability of a child's gene count given their parents' gene counts.
+    """
+    return [
+        [
+            [
+                get_joint_child_gene_probability_by_mother_father(
+                    mother_gene=mother_gene, father_gene=father_gene,
+                    child_gene=child_gene, mutation=mutation)
+                for child_gene in range(3)
+            ]
+            for father_gene in range(3)
+        ]
+        for mother_gene in range(3)
+    ]
 
-def get_probability_of_person_has_trait(people, person, trait, zero_genes, one_gene, two_genes):
 
-    if person in zero_genes:
-        person_gene = 0
-    elif person in one_gene:
-        person_gene = 1
-    elif person in two_genes:
-        person_gene = 2
-    else:
-        person_gene = None
-    
-    return PROBS["trait"][person_gene][trait]
+# Probabilities indexed by gene count (and trait as 0 or 1), built once from PROBS
+GENE = [PROBS["gene"][gene] for gene in range(3)]
+TRAIT = [[PROBS["trait"][gene][False], PROBS["trait"][gene][True]] for gene in range(3)]
+INHERITANCE = inheritance_table(PROBS["mutation"])
 
 
 def update(probabilities, one_gene, two_genes, have_trait, p):
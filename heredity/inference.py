@@ -0,0 +1,239 @@
+import heapq
+import itertools
+
+from heredity import GENE, INHERITANCE, TRAIT
+
+GENES = [0, 1, 2]
+
+
+class Factor():
+    """
+    A table of non-negative numbers over the gene counts (0, 1 or 2) of
+    some people. The value for gene counts `g` of `variables` is stored
+    at `values[sum(g[i] * 3 ** (k - 1 - i))]`, with `k` variables.
+    """
+
+    def __init__(self, variables, values):
+        self.variables = tuple(variables)
+        self.values = values
+
+    @classmethod
+    def from_function(cls, variables, function):
+        """
+        Return the factor whose value for gene counts `g` is `function(*g)`.
+        """
+        values = [function(*genes) for genes in itertools.product(GENES, repeat=len(variables))]
+        return cls(variables, values)
+
+    def strides(self, variables):
+        """
+        Return, for each of `variables`, how far apart in `values` its
+        gene counts are, or 0 for variables not in this factor.
+        """
+        stride = {}
+        step = 1
+        for variable in reversed(self.variables):
+            stride[variable] = step
+            step *= 3
+        return [stride.get(variable, 0) for variable in variables]
+
+    def positions(self, variables):
+        """
+        Return, for every assignment of gene counts to `variables` in the
+        order of `values`, the position of the matching value in this
+        factor, which must not have variables outside `variables`.
+        """
+        positions = [0]
+        for stride in self.strides(variables):
+            positions = [i + gene * stride for i in positions for gene in GENES]
+        return positions
+
+    def multiply(self, other):
+        """
+        Return the product of this factor and `other`.
+        """
+        variables = list(self.variables)
+        variables += [v for v in other.variables if v not in self.variables]
+        values = self.values
+        other_values = other.values
+        return Factor(variables, [
+            values[i] * other_values[j]
+            for i, j in zip(self.positions(variables), other.positions(variables))
+        ])
+
+    def normalized(self):
+        """
+        Return this factor divided by the sum of its values. Products of
+        many probabilities underflow on large families, so messages and
+        beliefs are kept normalized; only their proportions matter.
+        """
+        total = sum(self.values)
+        if total == 0:
+            raise ValueError("The known traits have probability 0")
+        return Factor(self.variables, [value / total for value in self.values])
+
+    def marginal(self, variables):
+        """
+        Return the factor over `variables`, a subset of this factor's
+        variables, that sums this factor over all other variables.
+        """
+        variables = [v for v in self.variables if v in variables]
+        result = Factor(variables, [0] * 3 ** len(variables))
+        values = result.values
+        for i, value in zip(result.positions(self.variables), self.values):
+            values[i] += value
+        return result
+
+
+def family_factor(people, person):
+    """
+    Return the factor of `person`'s gene count given their parents' gene
+    counts, multiplied by the probability of their trait if it is known.
+    """
+    mother = people[person]["mother"]
+    father = people[person]["father"]
+    trait = people[person]["trait"]
+
+    def evidence(gene):
+        return 1 if trait is None else TRAIT[gene][trait]
+
+    if mother and father:
+        return Factor.from_function(
+            [person, mother, father],
+            lambda gene, mother_gene, father_gene:
+            evidence(gene) * INHERITANCE[mother_gene][father_gene][gene])
+    return Factor.from_function([person], lambda gene: evidence(gene) * GENE[gene])
+
+
+def elimination_order(people):
+    """
+    Return an order in which to eliminate the gene variables of
+    `people` from their moral graph, greedily picking the person whose
+    elimination adds the fewest edges, and for each person the clique of
+    that person and their neighbours when they are eliminated.
+
+    The moral graph connects each person with their parents, and the
+    two parents of each person with each other.
+    """
+    neighbors = {person: set() for person in people}
+    for person in people:
+        family = [p for p in (person, people[person]["mother"], people[person]["father"]) if p]
+        for a, b in itertools.combinations(family, 2):
+            neighbors[a].add(b)
+            neighbors[b].add(a)
+
+    def fill_in(person):
+        return sum(1 for a, b in itertools.combinations(neighbors[person], 2)
+                   if b not in neighbors[a])
+
+    def key(person):
+        return (fill_in(person), len(neighbors[person]), person)
+
+    # Scores only change near eliminated people, so they are kept in a heap
+    # and checked again when they come out of it
+    heap = [key(person) for person in people]
+    heapq.heapify(heap)
+
+    order = []
+    cliques = {}
+    while heap:
+        entry = heapq.heappop(heap)
+        person = entry[2]
+        if person in cliques:
+            continue
+        current = key(person)
+        if current != entry:
+            heapq.heappush(heap, current)
+            continue
+
+        cliques[person] = {person} | neighbors[person]
+        for a, b in itertools.combinations(neighbors[person], 2):
+            neighbors[a].add(b)
+            neighbors[b].add(a)
+        for neighbor in neighbors[person]:
+            neighbors[neighbor].discard(person)
+        affected = set(neighbors[person])
+        for neighbor in neighbors[person]:
+            affected |= neighbors[neighbor]
+        del neighbors[person]
+        order.append(person)
+        for other in affected:
+            heapq.heappush(heap, key(other))
+    return order, cliques
+
+
+def junction_tree_probabilities(people):
+    """
+    Return the gene and trait probabilities of every person given the
+    known traits, in the same form as `heredity.main` computes them.
+
+    The family is a Bayesian network with one gene variable per person.
+    Eliminating the variables in `elimination_order` gives one clique
+    per person; each clique is joined to the clique of the first person
+    eliminated after it among its other members, which makes a junction
+    tree. Messages are passed towards the roots and back, after which
+    each clique holds the joint probability of its people and the
+    evidence, and each person's marginal is read off their own clique.
+    """
+    order, cliques = elimination_order(people)
+    position = {person: i for i, person in enumerate(order)}
+
+    # The clique of each person is joined to its parent in the tree
+    parent = {}
+    children = {person: [] for person in order}
+    for person in order:
+        later = cliques[person] - {person}
+        if later:
+            parent[person] = min(later, key=position.get)
+            children[parent[person]].append(person)
+
+    # Each family factor goes to the clique of the first of its people
+    # to be eliminated, which contains the whole family
+    potentials = {person: Factor([person], [1, 1, 1]) for person in order}
+    for person in people:
+        factor = family_factor(people, person)
+        first = min(factor.variables, key=position.get)
+        potentials[first] = potentials[first].multiply(factor).normalized()
+
+    # Cliques are eliminated leaves first, so `order` is a valid upward pass
+    upward = {}
+    for person in order:
+        if person in parent:
+            belief = potentials[person]
+            for child in children[person]:
+                belief = belief.multiply(upward[child])
+            upward[person] = belief.marginal(cliques[person] - {person}).normalized()
+
+    downward = {}
+    beliefs = {}
+    for person in reversed(order):
+        belief = potentials[person]
+        if person in parent:
+            belief = belief.multiply(downward[person])
+        for child in children[person]:
+            belief = belief.multiply(upward[child])
+        beliefs[person] = belief.normalized()
+        for child in children[person]:
+            message = potentials[person]
+            if person in parent:
+                message = message.multiply(downward[person])
+            for sibling in children[person]:
+                if sibling != child:
+                    message = message.multiply(upward[sibling])
+            downward[child] = message.marginal(cliques[child] - {child}).normalized()
+
+    probabilities = {}
+    for person in people:
+        genes = beliefs[person].marginal({person}).values
+        total = sum(genes)
+        gene = {g: genes[g] / total for g in (2, 1, 0)}
+        trait = people[person]["trait"]
+        if trait is None:
+            have_trait = sum(gene[g] * TRAIT[g][1] for g in GENES)
+        else:
+            have_trait = 1 if trait else 0
+        probabilities[person] = {
+            "gene": gene,
+            "trait": {True: have_trait, False: 1 - have_trait},
+        }
+    return probabilities
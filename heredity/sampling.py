@@ -0,0 +1,294 @@
+import math
+import random
+import sys
+from multiprocessing import Pool
+
+from heredity import GENE, INHERITANCE, TRAIT, Family
+
+SAMPLES = 10000
+
+# Samples are tallied in this many batches, whose spread gives the error estimate
+BATCHES = 20
+
+# Fraction of Gibbs sweeps discarded before tallying
+BURN_IN = 0.1
+
+# Logarithms of TRAIT, as likelihood weights are summed in log space
+LOG_TRAIT = [[math.log(p) if p > 0 else -math.inf for p in row] for row in TRAIT]
+
+
+class Tally():
+    """
+    Weighted sums of each person's gene counts and of the probability
+    that they have the trait, kept per batch of samples.
+
+    The spread of the estimates of different batches gives a standard
+    error for the estimate of all batches together. Tallies of separate
+    runs, such as one per worker process, are combined with `merge`.
+    """
+
+    def __init__(self, n):
+        self.n = n
+
+        # (scale, weight, gene sums, trait sums, samples) of each finished
+        # batch, with the sums divided by exp(scale)
+        self.batches = []
+        self.start_batch()
+
+    def start_batch(self):
+        self.scale = -math.inf
+        self.weight = 0
+        self.genes = [[0, 0, 0] for _ in range(self.n)]
+        self.traits = [0] * self.n
+        self.samples = 0
+
+    def add(self, log_weight, genes, traits):
+        """
+        Add a sample of weight exp(`log_weight`), where `genes[i]` and
+        `traits[i]` are person i's gene count probabilities and trait
+        probability.
+
+        The weights of large families underflow, so the sums of a batch
+        are kept divided by exp(`scale`), the largest weight seen so far.
+        """
+        self.samples += 1
+        if log_weight == -math.inf:
+            return
+        if log_weight > self.scale:
+            rescale = math.exp(self.scale - log_weight)
+            self.weight *= rescale
+            for i in range(self.n):
+                self.genes[i] = [total * rescale for total in self.genes[i]]
+                self.traits[i] *= rescale
+            self.scale = log_weight
+        weight = math.exp(log_weight - self.scale)
+        self.weight += weight
+        for i in range(self.n):
+            totals = self.genes[i]
+            gene = genes[i]
+            totals[0] += weight * gene[0]
+            totals[1] += weight * gene[1]
+            totals[2] += weight * gene[2]
+            self.traits[i] += weight * traits[i]
+
+    def end_batch(self):
+        if self.samples:
+            self.batches.append(
+                (self.scale, self.weight, self.genes, self.traits, self.samples))
+        self.start_batch()
+
+    def merge(self, other):
+        """
+        Add the finished batches of `other` to this tally.
+        """
+        self.batches.extend(other.batches)
+
+    def sample_count(self):
+        return sum(batch[4] for batch in self.batches)
+
+    def estimates(self, batches):
+        """
+        Return the gene and trait estimates of each person from `batches`,
+        brought to the scale of the largest one.
+        """
+        batches = [batch for batch in batches if batch[1] > 0]
+        if not batches:
+            raise ValueError("Every sample has weight 0 given the known traits")
+        largest = max(batch[0] for batch in batches)
+        rescales = [math.exp(batch[0] - largest) for batch in batches]
+        weight = sum(rescale * batch[1] for rescale, batch in zip(rescales, batches))
+        genes = [
+            [sum(rescale * batch[2][i][gene] for rescale, batch in zip(rescales, batches)) / weight
+             for gene in range(3)]
+            for i in range(self.n)
+        ]
+        traits = [
+            sum(rescale * batch[3][i] for rescale, batch in zip(rescales, batches)) / weight
+            for i in range(self.n)
+        ]
+        return genes, traits
+
+    def standard_error(self):
+        """
+        Return the largest standard error of any estimate, from the
+        spread of the estimates of single batches, or None with fewer
+        than two batches.
+        """
+        batches = [batch for batch in self.batches if batch[1] > 0]
+        if len(batches) < 2:
+            return None
+        estimates = [self.estimates([batch]) for batch in batches]
+        genes, traits = self.estimates(batches)
+        largest = 0
+        for i in range(self.n):
+            values = [(genes[i][gene], [e[0][i][gene] for e in estimates]) for gene in range(3)]
+            values.append((traits[i], [e[1][i] for e in estimates]))
+            for mean, samples in values:
+                variance = sum((s - mean) ** 2 for s in samples) / (len(samples) - 1)
+                largest = max(largest, math.sqrt(variance / len(samples)))
+        return largest
+
+
+def sample_genes(family, order, rng):
+    """
+    Return gene counts for everyone in `family`, drawn from PROBS with
+    parents before their children.
+    """
+    genes = [0] * len(order)
+    for i in order:
+        mother = family.mothers[i]
+        father = family.fathers[i]
+        if mother < 0 or father < 0:
+            distribution = GENE
+        else:
+            distribution = INHERITANCE[genes[mother]][genes[father]]
+        genes[i] = rng.choices((0, 1, 2), distribution)[0]
+    return genes
+
+
+def likelihood_weighting(family, samples, rng, tally, report=None):
+    """
+    Add `samples` samples to `tally` by likelihood weighting: genes are
+    drawn from PROBS ignoring the known traits, and each sample is
+    weighted by the probability of the known traits given its genes,
+    which is summed in log space because it underflows on large families.
+    Instead of drawing unknown traits, the probability of the trait
+    given the sampled gene count is tallied, which has lower variance.
+    """
+    order = family.parents_first()
+    batch = max(1, samples // BATCHES)
+    for k in range(samples):
+        genes = sample_genes(family, order, rng)
+        log_weight = 0
+        for i, trait in enumerate(family.traits):
+            if trait is not None:
+                log_weight += LOG_TRAIT[genes[i]][trait]
+        tally.add(
+            log_weight,
+            [[int(gene == g) for g in range(3)] for gene in genes],
+            [TRAIT[gene][1] if trait is None else int(trait)
+             for gene, trait in zip(genes, family.traits)])
+        if (k + 1) % batch == 0 or k + 1 == samples:
+            tally.end_batch()
+            if report is not None:
+                report(tally)
+
+
+def gibbs_sampling(family, samples, rng, tally, report=None):
+    """
+    Add `samples` sweeps to `tally` by Gibbs sampling, after discarding
+    BURN_IN of that many sweeps. Each sweep draws every person's gene
+    count in turn from its distribution given everyone else's genes and
+    the known traits, which only involves the person's parents, their
+    children and the children's other parents.
+
+    Instead of the drawn gene count, its distribution is tallied, along
+    with the probability of the trait it implies.
+    """
+    n = len(family.names)
+    children = [[] for _ in range(n)]
+    for child in range(n):
+        if family.mothers[child] >= 0 and family.fathers[child] >= 0:
+            children[family.mothers[child]].append(child)
+            children[family.fathers[child]].append(child)
+
+    genes = sample_genes(family, family.parents_first(), rng)
+    burn_in = int(samples * BURN_IN)
+    batch = max(1, samples // BATCHES)
+    distributions = [None] * n
+    for k in range(-burn_in, samples):
+        for i in range(n):
+            mother = family.mothers[i]
+            father = family.fathers[i]
+            trait = family.traits[i]
+            weights = []
+            for gene in range(3):
+                if mother < 0 or father < 0:
+                    weight = GENE[gene]
+                else:
+                    weight = INHERITANCE[genes[mother]][genes[father]][gene]
+                if trait is not None:
+                    weight *= TRAIT[gene][trait]
+                genes[i] = gene
+                for child in children[i]:
+                    weight *= INHERITANCE[genes[family.mothers[child]]][
+                        genes[family.fathers[child]]][genes[child]]
+                weights.append(weight)
+            total = sum(weights)
+            distributions[i] = [weight / total for weight in weights]
+            genes[i] = rng.choices((0, 1, 2), weights)[0]
+
+        if k < 0:
+            continue
+        tally.add(0, distributions, [
+            sum(distribution[g] * TRAIT[g][1] for g in range(3)) if trait is None else int(trait)
+            for distribution, trait in zip(distributions, family.traits)])
+        if (k + 1) % batch == 0 or k + 1 == samples:
+            tally.end_batch()
+            if report is not None:
+                report(tally)
+
+
+SAMPLERS = {
+    "likelihood": likelihood_weighting,
+    "gibbs": gibbs_sampling,
+}
+
+
+def run_worker(task):
+    """
+    Run one worker of `sample_probabilities` and return its tally.
+    Each worker seeds its own generator from the run's seed and its number.
+    """
+    method, people, samples, seed, worker = task
+    family = Family(people)
+    tally = Tally(len(family.names))
+    SAMPLERS[method](family, samples, random.Random(f"{seed}:{worker}"), tally)
+    return tally
+
+
+def sample_probabilities(people, method, samples=SAMPLES, seed=None, workers=0, report=None):
+    """
+    Return approximate gene and trait probabilities of every person,
+    in the same form as `heredity.enumerate_probabilities`, from
+    `samples` samples of `method` ("likelihood" or "gibbs"), together
+    with the largest standard error of any of them.
+
+    With `workers` > 1 the samples are split between that many worker
+    processes, each with its own seeded generator, and their tallies
+    are merged. `report` is called with the tally so far after every
+    batch, or after every worker with `workers` > 1.
+    """
+    if seed is None:
+        seed = random.randrange(2 ** 32)
+    family = Family(people)
+    tally = Tally(len(family.names))
+
+    if workers > 1:
+        tasks = [
+            (method, people, samples // workers + (worker < samples % workers), seed, worker)
+            for worker in range(workers)
+        ]
+        with Pool(workers) as pool:
+            for worker_tally in pool.imap_unordered(run_worker, tasks):
+                tally.merge(worker_tally)
+                if report is not None:
+                    report(tally)
+    else:
+        SAMPLERS[method](family, samples, random.Random(f"{seed}:0"), tally, report)
+
+    genes, traits = tally.estimates(tally.batches)
+    probabilities = {
+        name: {
+            "gene": {gene: genes[i][gene] for gene in (2, 1, 0)},
+            "trait": {True: traits[i], False: 1 - traits[i]},
+        }
+        for i, name in enumerate(family.names)
+    }
+    return probabilities, tally.standard_error()
+
+
+def print_progress(tally):
+    error = tally.standard_error()
+    error = "n/a" if error is None else f"{error:.4f}"
+    print(f"{tally.sample_count()} samples, largest standard error {error}", file=sys.stderr)
@@ -0,0 +1,93 @@
+import itertools
+
+import numpy as np
+
+from heredity import GENE, INHERITANCE, TRAIT, Family
+
+# Assignments whose joint probabilities are computed in one pass are
+# at most 3^BLOCK_PEOPLE
+BLOCK_PEOPLE = 10
+
+
+def vectorized_probabilities(people, block_people=BLOCK_PEOPLE):
+    """
+    Return the gene and trait probabilities of every person by exact
+    enumeration, like `heredity.enumerate_probabilities`, but with NumPy.
+
+    Gene counts are enumerated as base-3 numbers with one digit per
+    person. A block holds every value of the lowest `block_people`
+    digits, which are the same index arrays for every block, for one
+    value of the other digits and of the unknown traits. The joint
+    probabilities of a whole block are found by table lookups in one
+    pass. People in the other digits have a single gene count in a
+    block, so the block's total is added to it with `np.add.at`. For
+    people in the lowest digits, the probabilities of each row are
+    summed over all blocks first and added to their gene totals with
+    `np.add.at` at the end.
+    """
+    family = Family(people)
+    n = len(family.names)
+    persons = np.arange(n)
+    low = min(n, block_people)
+
+    # table[i, trait, 9 * mother_gene + 3 * father_gene + gene] is the
+    # factor of person i in the joint probability
+    table = np.empty((n, 2, 27))
+    inheritance = np.array(INHERITANCE)
+    for i in range(n):
+        for trait in (0, 1):
+            if family.mothers[i] < 0 or family.fathers[i] < 0:
+                factor = np.broadcast_to(np.array(GENE), (3, 3, 3))
+            else:
+                factor = inheritance
+            table[i, trait] = (factor * np.array(TRAIT)[:, trait]).ravel()
+    founders = np.array([m < 0 or f < 0 for m, f in zip(family.mothers, family.fathers)])
+    mothers = np.where(founders, persons, family.mothers)
+    fathers = np.where(founders, persons, family.fathers)
+
+    def codes(genes):
+        """
+        Return the positions in `table` of the factors of `genes`, which
+        is linear in the gene counts.
+        """
+        codes = 9 * genes[..., mothers] + 3 * genes[..., fathers] + genes
+        return np.where(founders, genes, codes)
+
+    # Gene counts of the lowest digits, identical in every block
+    low_genes = np.zeros((3 ** low, n), dtype=np.int64)
+    low_genes[:, :low] = np.indices((3,) * low).reshape(low, -1).T
+    low_codes = codes(low_genes) + 54 * persons
+
+    unknown = [i for i, trait in enumerate(family.traits) if trait is None]
+    traits = np.array([int(bool(trait)) for trait in family.traits])
+    flat_table = table.ravel()
+
+    gene_totals = np.zeros((n, 3))
+    trait_totals = np.zeros((n, 2))
+    low_totals = np.zeros((3 ** low,))
+    for unknown_traits in itertools.product((0, 1), repeat=len(unknown)):
+        traits[unknown] = unknown_traits
+        for high_genes in itertools.product(range(3), repeat=n - low):
+            genes = np.zeros(n, dtype=np.int64)
+            genes[low:] = high_genes
+            offset = codes(genes) + 27 * traits
+            p = flat_table[low_codes + offset].prod(axis=1)
+
+            # People in the high digits have the same gene count in the whole block
+            total = p.sum()
+            np.add.at(gene_totals, (persons[low:], genes[low:]), total)
+            trait_totals[persons, traits] += total
+            low_totals += p
+
+    # People in the low digits have each gene count in a fixed set of rows
+    np.add.at(gene_totals, (persons[:low], low_genes[:, :low]), low_totals[:, np.newaxis])
+
+    gene_totals /= gene_totals.sum(axis=1, keepdims=True)
+    trait_totals /= trait_totals.sum(axis=1, keepdims=True)
+    return {
+        name: {
+            "gene": {gene: float(gene_totals[i, gene]) for gene in (2, 1, 0)},
+            "trait": {True: float(trait_totals[i, 1]), False: float(trait_totals[i, 0])},
+        }
+        for i, name in enumerate(family.names)
+    }
@@ -0,0 +1,161 @@
+import argparse
+import os
+import random
+import time
+import tracemalloc
+
+from pagerank import (DAMPING, THRESHOLD, ConvergenceTrace, adaptive_pagerank, crawl,
+                      fast_sample_pagerank, gauss_seidel_pagerank, iterate_pagerank)
+from vectorized import batched_sample_pagerank, vectorized_pagerank
+
+SIZES = [1_000, 10_000, 100_000]
+
+# Average number of links per page, and the exponent of the power law
+# that decides how many links point to each page
+AVERAGE_LINKS = 8
+EXPONENT = 2.1
+
+# The pure-Python engines are slow, so above this size they are skipped
+PYTHON_LIMIT = 100_000
+
+# Bundled corpora compared by --solvers, next to the generated ones
+CORPORA = ["corpus0", "corpus1", "corpus2"]
+
+SOLVERS = [
+    ("jacobi", lambda corpus, threshold, stats: iterate_pagerank(
+        corpus, DAMPING, dangling="scalar", threshold=threshold, stats=stats)),
+    ("gauss-seidel", lambda corpus, threshold, stats: gauss_seidel_pagerank(
+        corpus, DAMPING, threshold=threshold, stats=stats)),
+    ("adaptive", lambda corpus, threshold, stats: adaptive_pagerank(
+        corpus, DAMPING, threshold=threshold, stats=stats)),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare PageRank engines on synthetic power-law link graphs.")
+    parser.add_argument("sizes", nargs="*", type=int, default=SIZES,
+                        help="number of pages of each generated corpus")
+    parser.add_argument("--links", type=float, default=AVERAGE_LINKS,
+                        help="average number of links per page")
+    parser.add_argument("--samples", type=int, default=1_000_000,
+                        help="number of pages sampled by the samplers")
+    parser.add_argument("--python-limit", type=int, default=PYTHON_LIMIT,
+                        help="largest size to run the pure-Python engines on")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    parser.add_argument("--solvers", action="store_true",
+                        help="compare the iterative solvers on the bundled and generated corpora")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help="convergence threshold of the solvers compared by --solvers")
+    args = parser.parse_args()
+
+    if args.solvers:
+        directory = os.path.dirname(os.path.abspath(__file__))
+        corpora = [(name, crawl(os.path.join(directory, name))) for name in CORPORA]
+        corpora += [
+            (f"power law {n}", power_law_corpus(n, args.links, EXPONENT, args.seed))
+            for n in args.sizes if n <= args.python_limit
+        ]
+        compare_solvers(corpora, args.threshold)
+        return
+
+    engines = [
+        ("iterate", True, lambda corpus, trace: iterate_pagerank(
+            corpus, DAMPING, dangling="scalar", callback=trace)),
+        ("fast sample", True, lambda corpus, trace: fast_sample_pagerank(
+            corpus, DAMPING, args.samples, seed=args.seed)),
+        ("vectorized", False, lambda corpus, trace: vectorized_pagerank(
+            corpus, DAMPING, callback=trace)),
+        ("batched sample", False, lambda corpus, trace: batched_sample_pagerank(
+            corpus, DAMPING, args.samples, seed=args.seed)),
+    ]
+
+    print(f"{'engine':<16} {'pages':>8} {'iterations':>10} {'time':>10} "
+          f"{'peak memory':>12} {'L1 error':>10} {'max error':>10}")
+    for n in args.sizes:
+        corpus = power_law_corpus(n, args.links, EXPONENT, args.seed)
+        reference = vectorized_pagerank(corpus, DAMPING, tolerance=1e-12, max_iterations=1000)
+        for name, python, engine in engines:
+            if python and n > args.python_limit:
+                print(f"{name:<16} {n:>8} {'skipped (--python-limit)':>34}")
+                continue
+            trace = ConvergenceTrace()
+            ranks, seconds, peak = measure(engine, corpus, trace)
+            iterations = len(trace) if len(trace) else "-"
+            l1 = sum(abs(ranks[page] - reference[page]) for page in corpus)
+            worst = max(abs(ranks[page] - reference[page]) for page in corpus)
+            print(f"{name:<16} {n:>8} {iterations:>10} {seconds:>9.3f}s "
+                  f"{peak / 2 ** 20:>10.1f}MB {l1:>10.2e} {worst:>10.2e}")
+
+
+def compare_solvers(corpora, threshold):
+    """
+    Print the iterations, page updates, time and largest error of each
+    solver on each of the (name, corpus) pairs in `corpora`, and how many
+    fewer iterations and updates than the Jacobi solver each one needed.
+    """
+    print(f"{'corpus':<16} {'solver':<13} {'iterations':>10} {'updates':>11} "
+          f"{'time':>9} {'max error':>10} {'saved iterations':>17} {'saved updates':>14}")
+    for name, corpus in corpora:
+        reference = vectorized_pagerank(corpus, DAMPING, tolerance=1e-12, max_iterations=1000)
+        baseline = None
+        for solver, run in SOLVERS:
+            stats = {}
+            start = time.perf_counter()
+            ranks = run(corpus, threshold, stats)
+            seconds = time.perf_counter() - start
+            iterations = stats["iterations"]
+            updates = stats.get("updates", iterations * len(corpus))
+            if baseline is None:
+                baseline = iterations, updates
+            worst = max(abs(ranks[page] - reference[page]) for page in corpus)
+            print(f"{name:<16} {solver:<13} {iterations:>10} {updates:>11} {seconds:>8.3f}s "
+                  f"{worst:>10.2e} {1 - iterations / baseline[0]:>17.0%} "
+                  f"{1 - updates / baseline[1]:>14.0%}")
+
+
+def power_law_corpus(n, average_links, exponent, seed=0):
+    """
+    Return a corpus of `n` pages whose numbers of incoming links follow
+    a power law with the given `exponent`, as on the web. Each page has
+    a random number of links averaging `average_links`, and a few pages
+    have none at all.
+    """
+    rng = random.Random(seed)
+    pages = [f"{i}.html" for i in range(n)]
+
+    # Page i is linked to in proportion to i^(-1 / (exponent - 1)), which
+    # gives in-degrees with a power-law tail of the given exponent
+    weights = [(i + 1) ** (-1 / (exponent - 1)) for i in range(n)]
+    rng.shuffle(weights)
+
+    corpus = {}
+    links = rng.choices(range(n), weights, k=int(n * average_links))
+    position = 0
+    for i, page in enumerate(pages):
+        count = min(int(rng.expovariate(1 / average_links)), len(links) - position)
+        targets = links[position:position + count]
+        position += count
+        corpus[page] = set(pages[j] for j in targets if j != i)
+    return corpus
+
+
+def measure(engine, corpus, trace):
+    """
+    Run `engine` on `corpus` twice: once to time it, and once under
+    tracemalloc, which slows it down, to find its peak memory use.
+    Return the ranks, the seconds taken and the peak memory in bytes.
+    """
+    start = time.perf_counter()
+    ranks = engine(corpus, trace)
+    seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    engine(corpus, None)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return ranks, seconds, peak
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+import argparse
+import hashlib
+import json
+import os
+import posixpath
+import re
+import struct
+import sys
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+LINK_PATTERN = re.compile(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"")
+
+MAGIC = b"PREDGES1"
+
+# Name of the crawl cache written into the corpus directory
+CACHE_NAME = "pagerank.cache"
+CACHE_VERSION = 1
+
+# Characters read from an HTML file at a time
+CHUNK_CHARS = 64 * 1024
+
+# Longest unfinished tag carried over from one chunk to the next
+MAX_TAG = 64 * 1024
+
+# Pages parsed by a worker process per task
+BATCH_PAGES = 256
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python pagerank/crawler.py")
+    parser.add_argument("directory")
+    parser.add_argument("output", help="edge list file to write")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="number of processes parsing HTML files")
+    args = parser.parse_args()
+
+    pages, edges = write_edge_list(args.directory, args.output, args.workers)
+    print(f"Wrote {edges} links between {pages} pages to {args.output}")
+
+
+def find_pages(directory):
+    """
+    Return the paths of all HTML files under `directory`, including
+    subdirectories, relative to `directory` and with "/" as separator.
+    """
+    pages = []
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        relative = os.path.relpath(root, directory)
+        for filename in sorted(files):
+            if not filename.endswith(".html"):
+                continue
+            if relative == os.curdir:
+                pages.append(filename)
+            else:
+                pages.append(posixpath.join(*relative.split(os.sep), filename))
+    return pages
+
+
+def extract_links(path, chunk_chars=CHUNK_CHARS):
+    """
+    Return the set of link targets in the HTML file at `path`, reading
+    it `chunk_chars` characters at a time. A tag that is cut off at the
+    end of a chunk is carried over and matched with the next chunk.
+    """
+    links = set()
+    carry = ""
+    with open(path, encoding="utf-8", errors="replace") as f:
+        while True:
+            chunk = f.read(chunk_chars)
+            text = carry + chunk
+            end = 0
+            for match in LINK_PATTERN.finditer(text):
+                links.add(match.group(1))
+                end = match.end()
+            if not chunk:
+                return links
+
+            # Keep the last tag opened after the last match, which may be incomplete
+            start = text.rfind("<", end)
+            carry = text[start:] if start != -1 and len(text) - start <= MAX_TAG else ""
+
+
+def resolve_link(page, link):
+    """
+    Return the page that `link` on `page` points to, relative to the root
+    of the corpus, or None if it points outside the corpus.
+    """
+    link = link.split("#")[0].split("?")[0]
+    if not link or ":" in link:
+        return None
+    if link.startswith("/"):
+        target = posixpath.normpath(link.lstrip("/"))
+    else:
+        target = posixpath.normpath(posixpath.join(posixpath.dirname(page), link))
+    if target.startswith("../"):
+        return None
+    return target
+
+
+def parse_pages(directory, pages):
+    """
+    Return, for each of `pages`, the set of pages its links point to.
+    """
+    results = []
+    for page in pages:
+        links = set()
+        for link in extract_links(os.path.join(directory, *page.split("/"))):
+            target = resolve_link(page, link)
+            if target is not None and target != page:
+                links.add(target)
+        results.append(links)
+    return results
+
+
+def parsed_batches(directory, pages, workers=0):
+    """
+    Yield the results of `parse_pages` for consecutive batches of
+    `pages`, in order. With `workers` > 0 the batches are parsed by that
+    many worker processes, with at most two batches per worker in flight.
+    """
+    batches = [pages[i:i + BATCH_PAGES] for i in range(0, len(pages), BATCH_PAGES)]
+    if workers <= 0:
+        for batch in batches:
+            yield parse_pages(directory, batch)
+        return
+
+    with ProcessPoolExecutor(workers) as executor:
+        pending = []
+        for batch in batches:
+            pending.append(executor.submit(parse_pages, directory, batch))
+            if len(pending) >= 2 * workers:
+                yield pending.pop(0).result()
+        for future in pending:
+            yield future.result()
+
+
+def write_edge_list(directory, path, workers=0):
+    """
+    Crawl the HTML files under `directory` and write their link graph to
+    `path`. Return the number of pages and of links written.
+
+    The file holds a header, the page names separated by NUL bytes, and
+    then one pair of little-endian 32-bit page numbers per link. Links
+    are written as pages are parsed, so only the page names and one
+    batch of links are held in memory.
+    """
+    pages = find_pages(directory)
+    index = {page: i for i, page in enumerate(pages)}
+    names = "\0".join(pages).encode("utf-8")
+    edges = 0
+
+    # Write to a temporary file first so readers never see half an edge list
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<QQ", len(pages), len(names)))
+        f.write(names)
+
+        source = 0
+        for results in parsed_batches(directory, pages, workers):
+            pairs = array("i")
+            for links in results:
+                for target in sorted(index[link] for link in links if link in index):
+                    pairs.append(source)
+                    pairs.append(target)
+                source += 1
+            if sys.byteorder == "big":
+                pairs.byteswap()
+            pairs.tofile(f)
+            edges += len(pairs) // 2
+    os.replace(temporary, path)
+    return len(pages), edges
+
+
+def read_edge_list(path):
+    """
+    Return the page names and the (source, target) page numbers of the
+    links in an edge list written by `write_edge_list`.
+    """
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"Not an edge list: {path}")
+        count, names_length = struct.unpack("<QQ", f.read(16))
+        names = f.read(names_length).decode("utf-8")
+        pages = names.split("\0") if count else []
+        pairs = array("i", f.read())
+    if sys.byteorder == "big":
+        pairs.byteswap()
+    return pages, pairs[0::2], pairs[1::2]
+
+
+def cached_crawl(directory, workers=0):
+    """
+    Return the corpus under `directory`, as returned by `crawl` but
+    including subdirectories, together with the set of pages that were
+    added, removed, or whose links changed since the last call.
+
+    The links of every file are cached in `directory` with the file's
+    size, modification time and SHA-1 hash. Only files whose size or
+    modification time changed are hashed, and only files whose hash
+    changed are parsed again, by `workers` processes if `workers` > 0.
+    """
+    path = os.path.join(directory, CACHE_NAME)
+    try:
+        with open(path, encoding="utf-8") as f:
+            cache = json.load(f)
+        if cache.get("version") != CACHE_VERSION:
+            cache = None
+    except (FileNotFoundError, ValueError):
+        cache = None
+    old_files = cache["files"] if cache else {}
+
+    files = {}
+    stale = []
+    for page in find_pages(directory):
+        stat = os.stat(os.path.join(directory, *page.split("/")))
+        entry = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+        old = old_files.get(page)
+        if old is not None and old["size"] == entry["size"] and old["mtime_ns"] == entry["mtime_ns"]:
+            files[page] = old
+            continue
+
+        # A file that was only touched keeps its links
+        entry["hash"] = file_hash(os.path.join(directory, *page.split("/")))
+        if old is not None and old["hash"] == entry["hash"]:
+            entry["links"] = old["links"]
+        else:
+            stale.append(page)
+        files[page] = entry
+
+    parsed = 0
+    for results in parsed_batches(directory, stale, workers):
+        for links in results:
+            files[stale[parsed]]["links"] = sorted(links)
+            parsed += 1
+
+    corpus = corpus_from_files(files)
+    old_corpus = corpus_from_files(old_files)
+    changed = {
+        page for page in corpus.keys() | old_corpus.keys()
+        if corpus.get(page) != old_corpus.get(page)
+    }
+
+    try:
+        temporary = f"{path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump({"version": CACHE_VERSION, "files": files}, f)
+        os.replace(temporary, path)
+    except OSError as e:
+        print(f"Could not write crawl cache: {e}", file=sys.stderr)
+
+    return corpus, changed
+
+
+def file_hash(path):
+    sha1 = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            sha1.update(block)
+    return sha1.hexdigest()
+
+
+def corpus_from_files(files):
+    """
+    Return a corpus from cache entries, keeping only links to pages
+    that are in the cache.
+    """
+    return {
+        page: set(link for link in entry["links"] if link in files)
+        for page, entry in files.items()
+    }
+
+
+def load_corpus(path):
+    """
+    Return a corpus, as returned by `crawl`, from an edge list file.
+    """
+    pages, sources, targets = read_edge_list(path)
+    corpus = {page: set() for page in pages}
+    for source, target in zip(sources, targets):
+        corpus[pages[source]].add(pages[target])
+    return corpus
+
+
+if __name__ == "__main__":
+    main()
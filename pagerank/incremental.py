@@ -0,0 +1,138 @@
+import json
+import os
+
+from pagerank import THRESHOLD, iterate_pagerank
+
+
+class IncrementalPageRank():
+    """
+    Keeps a corpus together with its last PageRank values, so that after
+    links are added or removed the ranks can be recomputed starting from
+    the previous ones instead of from 1/N.
+
+    The corpus is copied and never modified: pages without links are
+    handled with `iterate_pagerank(..., dangling="scalar")`.
+    """
+
+    def __init__(self, corpus, damping_factor, ranks=None):
+        self.corpus = {page: set(links) for page, links in corpus.items()}
+        self.damping_factor = damping_factor
+        self.ranks = ranks
+
+        # Pages added, removed or whose links changed since the ranks were last computed
+        self.changed = set()
+
+        # Iterations taken the last time the ranks were computed
+        self.iterations = 0
+
+    def add_page(self, page):
+        if page not in self.corpus:
+            self.corpus[page] = set()
+            self.changed.add(page)
+
+    def add_link(self, source, target):
+        """
+        Add a link from `source` to `target`, adding either page if needed.
+        """
+        self.add_page(source)
+        self.add_page(target)
+        if target not in self.corpus[source]:
+            self.corpus[source].add(target)
+            self.changed.add(source)
+
+    def remove_link(self, source, target):
+        if target in self.corpus.get(source, ()):
+            self.corpus[source].remove(target)
+            self.changed.add(source)
+
+    def remove_page(self, page):
+        """
+        Remove `page` together with every link to it.
+        """
+        if page not in self.corpus:
+            return
+        del self.corpus[page]
+        self.changed.add(page)
+        for source, links in self.corpus.items():
+            if page in links:
+                links.remove(page)
+                self.changed.add(source)
+
+    def set_links(self, page, links):
+        """
+        Replace the links of `page`, adding any pages that do not exist yet.
+        """
+        self.add_page(page)
+        for link in links:
+            self.add_page(link)
+        if self.corpus[page] != set(links):
+            self.corpus[page] = set(links)
+            self.changed.add(page)
+
+    def update(self, corpus, pages=None):
+        """
+        Apply the differences between the kept corpus and `corpus`, such
+        as a fresh result of `crawl`, and return the pages that were added,
+        removed or whose links changed.
+
+        If `pages` is given, only those pages are compared, which is
+        enough when it holds every page that was added, removed or
+        changed since the kept corpus. The pages reported by
+        `crawler.cached_crawl` changed since its cache was last written,
+        which is not enough if the cache was written without this state.
+        """
+        if pages is None:
+            pages = self.corpus.keys() | corpus.keys()
+        for page in pages:
+            if page in corpus:
+                self.set_links(page, corpus[page])
+            else:
+                self.remove_page(page)
+        return set(self.changed)
+
+    def refresh(self, threshold=THRESHOLD, callback=None):
+        """
+        Return PageRank values for the current corpus, warm-started from
+        the last ones. Nothing is recomputed if no links changed.
+        `threshold` and `callback` are passed to `iterate_pagerank`.
+        """
+        if self.ranks is not None and not self.changed:
+            return self.ranks
+        stats = {}
+        self.ranks = iterate_pagerank(
+            self.corpus, self.damping_factor, dangling="scalar",
+            initial=self.ranks, stats=stats, threshold=threshold, callback=callback)
+        self.iterations = stats["iterations"]
+        self.changed = set()
+        return self.ranks
+
+    def save(self, path):
+        """
+        Write the corpus and its ranks to `path` as JSON.
+        """
+        state = {
+            "damping_factor": self.damping_factor,
+            "corpus": {page: sorted(links) for page, links in self.corpus.items()},
+            "ranks": self.refresh(),
+        }
+
+        # Write to a temporary file first so a crash never leaves half a file
+        temporary = f"{path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path, damping_factor):
+        """
+        Read the state saved at `path`, or return None if there is none or
+        it was computed with a different damping factor.
+        """
+        try:
+            with open(path, encoding="utf-8") as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return None
+        if state["damping_factor"] != damping_factor:
+            return None
+        return cls(state["corpus"], damping_factor, state["ranks"])
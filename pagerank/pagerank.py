@@ -1,24 +1,163 @@
+import argparse
+import math
 import os
 import random
 import re
 import sys
+import time
+from multiprocessing import Pool, cpu_count
 
 DAMPING = 0.85
 SAMPLES = 10000
 
+# Largest change in any page's rank at which iterate_pagerank stops
+THRESHOLD = 0.001
+
 
 def main():
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python pagerank/pagerank.py pagerank/corpus")
-    corpus = crawl(sys.argv[1])
-    ranks = sample_pagerank(corpus, DAMPING, SAMPLES)
-    print(f"PageRank Results from Sampling (n = {SAMPLES})")
+    parser = argparse.ArgumentParser(prog="python pagerank/pagerank.py")
+    parser.add_argument("corpus", help="directory of HTML pages, or edge list written by crawler.py")
+    parser.add_argument("--samples", type=int, default=SAMPLES,
+                        help="number of pages to sample")
+    parser.add_argument("--sampler", choices=["original", "fast", "batched"], default="fast",
+                        help="implementation used for sampling")
+    parser.add_argument("--seed", type=int, help="random seed for sampling")
+    parser.add_argument("--walkers", type=int,
+                        help="split sampling into this many independent walks run in parallel")
+    parser.add_argument("--workers", type=int,
+                        help="number of processes running the walkers (default: all CPUs)")
+    parser.add_argument("--engine", choices=["python", "vectorized"], default="python",
+                        help="implementation used for iteration")
+    parser.add_argument("--solver", choices=["jacobi", "gauss-seidel", "adaptive"],
+                        help="iteration scheme used by the python engine (default: jacobi)")
+    parser.add_argument("--threshold", type=float,
+                        help="largest change in any rank at which the python engine stops "
+                             f"(default: {THRESHOLD})")
+    parser.add_argument("--trace", action="store_true",
+                        help="print the L1 change and time of every iteration")
+    parser.add_argument("--tolerance", type=float,
+                        help="L1 change at which the vectorized engine stops")
+    parser.add_argument("--max-iterations", type=int,
+                        help="iteration cap for the vectorized engine")
+    parser.add_argument("--personalize",
+                        help="file with one set of seed pages per line, to rank pages for each set")
+    parser.add_argument("--cache", action="store_true",
+                        help="cache the links of each page in the corpus directory")
+    parser.add_argument("--state",
+                        help="file keeping the last ranks, so iteration can start from them")
+    args = parser.parse_args()
+    # Each engine has its own stopping rule, so options of the other are refused
+    if args.engine == "python":
+        if args.tolerance is not None or args.max_iterations is not None:
+            parser.error("--tolerance and --max-iterations require --engine vectorized")
+    elif args.solver is not None or args.threshold is not None:
+        parser.error("--solver and --threshold require --engine python")
+    if args.state and (args.engine != "python" or args.solver not in (None, "jacobi")):
+        parser.error("--state requires --engine python and --solver jacobi")
+    if args.threshold is None:
+        args.threshold = THRESHOLD
+
+    if os.path.isfile(args.corpus):
+        from crawler import load_corpus
+        corpus = load_corpus(args.corpus)
+    elif args.cache:
+        from crawler import cached_crawl
+        corpus, changed = cached_crawl(args.corpus, args.workers or 0)
+        print(f"Crawl cache: {len(changed)} pages changed", file=sys.stderr)
+    else:
+        corpus = crawl(args.corpus)
+    errors = None
+    if args.walkers:
+        ranks, errors = parallel_sample_pagerank(
+            corpus, DAMPING, args.samples, args.walkers, args.workers, args.seed)
+    elif args.sampler == "batched":
+        from vectorized import batched_sample_pagerank
+        ranks = batched_sample_pagerank(corpus, DAMPING, args.samples, seed=args.seed)
+    elif args.sampler == "fast":
+        ranks = fast_sample_pagerank(corpus, DAMPING, args.samples, seed=args.seed)
+    else:
+        random.seed(args.seed)
+        ranks = sample_pagerank(corpus, DAMPING, args.samples)
+    print(f"PageRank Results from Sampling (n = {args.samples})")
     for page in sorted(ranks):
-        print(f"  {page}: {ranks[page]:.4f}")
-    ranks = iterate_pagerank(corpus, DAMPING)
+        if errors is None:
+            print(f"  {page}: {ranks[page]:.4f}")
+        else:
+            print(f"  {page}: {ranks[page]:.4f} ± {errors[page]:.4f}")
+    if errors is not None:
+        print(f"Largest standard error across {args.walkers} walkers: "
+              f"{max(errors.values()):.5f}")
+    trace = ConvergenceTrace() if args.trace else None
+    if args.engine == "vectorized":
+        from vectorized import vectorized_pagerank
+        options = {}
+        if args.tolerance is not None:
+            options["tolerance"] = args.tolerance
+        if args.max_iterations is not None:
+            options["max_iterations"] = args.max_iterations
+        ranks = vectorized_pagerank(corpus, DAMPING, callback=trace, **options)
+    elif args.state:
+        ranks = incremental_pagerank(corpus, args.state, args.threshold, trace)
+    elif args.solver == "gauss-seidel":
+        ranks = gauss_seidel_pagerank(corpus, DAMPING, threshold=args.threshold, callback=trace)
+    elif args.solver == "adaptive":
+        ranks = adaptive_pagerank(corpus, DAMPING, threshold=args.threshold, callback=trace)
+    else:
+        ranks = iterate_pagerank(corpus, DAMPING, dangling="scalar",
+                                 threshold=args.threshold, callback=trace)
     print(f"PageRank Results from Iteration")
     for page in sorted(ranks):
         print(f"  {page}: {ranks[page]:.4f}")
+    if trace is not None:
+        print("Convergence")
+        trace.print()
+    if args.personalize:
+        print_personalized(corpus, args.personalize)
+
+
+def print_personalized(corpus, path):
+    """
+    Print the highest personalized PageRank values for each line of
+    seed pages in the file at `path`.
+    """
+    from vectorized import LinkMatrix, personalized_pagerank, teleport_matrix
+    with open(path) as f:
+        seed_sets = [line.split() for line in f if line.strip()]
+    for seeds in seed_sets:
+        for page in seeds:
+            if page not in corpus:
+                sys.exit(f"Seed page not in corpus: {page}")
+
+    links = LinkMatrix(corpus)
+    ranks = personalized_pagerank(corpus, DAMPING, teleport_matrix(links, seed_sets), links=links)
+    for k, seeds in enumerate(seed_sets):
+        print(f"Personalized PageRank for {' '.join(seeds)}")
+        for i in ranks[:, k].argsort()[::-1][:5]:
+            print(f"  {links.pages[i]}: {ranks[i, k]:.4f}")
+
+
+def incremental_pagerank(corpus, path, threshold=THRESHOLD, callback=None):
+    """
+    Return PageRank values for `corpus`, warm-started from the ranks
+    saved at `path` by an earlier run, and save the new ones there.
+    `threshold` and `callback` are passed to `iterate_pagerank`.
+
+    Every page is compared with the saved corpus. The pages reported
+    by `cached_crawl` changed since the crawl cache was last written,
+    which need not be when the state was saved.
+    """
+    from incremental import IncrementalPageRank
+    state = IncrementalPageRank.load(path, DAMPING)
+    if state is None:
+        state = IncrementalPageRank(corpus, DAMPING)
+        changed = set(corpus)
+    else:
+        changed = state.update(corpus)
+    ranks = state.refresh(threshold, callback)
+    state.save(path)
+    print(f"{len(changed)} pages changed, converged in {state.iterations} iterations",
+          file=sys.stderr)
+    return ranks
 
 
 def crawl(directory):
@@ -106,7 +245,144 @@ def sample_pagerank(corpus, damping_factor, n):
     return sample_pagerank
 
 
-def iterate_pagerank(corpus, damping_factor):
+def fast_sample_pagerank(corpus, damping_factor, n, seed=None):
+    """
+    Return PageRank values for each page by sampling `n` pages,
+    like `sample_pagerank`, but with O(1) work per sample.
+
+    The links of every page are put in a list once. On each step, with
+    probability `damping_factor` a random link of the current page is
+    followed, and otherwise (or if the page has no links) a page is chosen
+    at random from the whole corpus. Visits are counted as they happen.
+    `seed` makes the walk reproducible.
+    """
+    pages, links = index_links(corpus)
+    counts = random_walk(links, damping_factor, n, random.Random(seed))
+    return {page: counts[i] / n for i, page in enumerate(pages)}
+
+
+def index_links(corpus):
+    """
+    Number the pages of `corpus` and return the list of pages together
+    with, for every page, the list of the numbers of the pages it links to.
+    Pages and links are sorted, so that a seeded walk does not depend on
+    the order in which sets happen to be iterated.
+    """
+    pages = sorted(corpus)
+    index = {page: i for i, page in enumerate(pages)}
+    links = [sorted(index[link] for link in corpus[page]) for page in pages]
+    return pages, links
+
+
+def random_walk(links, damping_factor, n, rng):
+    """
+    Take a random walk of `n` pages over `links` (as returned by
+    `index_links`) using the random number generator `rng`, and return
+    how many times each page was visited.
+    """
+    counts = [0] * len(links)
+
+    # The first sample is chosen from all pages at random
+    page = rng.randrange(len(links))
+    counts[page] += 1
+
+    for _ in range(n - 1):
+        page_links = links[page]
+        if page_links and rng.random() < damping_factor:
+            page = page_links[int(rng.random() * len(page_links))]
+        else:
+            page = int(rng.random() * len(links))
+        counts[page] += 1
+
+    return counts
+
+
+# Links of the corpus being sampled, set once in each worker process
+worker_links = None
+
+
+def init_walker(links):
+    global worker_links
+    worker_links = links
+
+
+def run_walker(task):
+    """
+    Run one walker of `parallel_sample_pagerank` in a worker process.
+    Each walker seeds its own generator from the run's seed and its number.
+    """
+    walker, damping_factor, n, seed = task
+    return random_walk(worker_links, damping_factor, n, random.Random(f"{seed}:{walker}"))
+
+
+def parallel_sample_pagerank(corpus, damping_factor, n, walkers, workers=None, seed=None):
+    """
+    Return PageRank values for each page estimated from `walkers`
+    independent random walks that together sample `n` pages, run on a
+    pool of `workers` processes, together with the standard error of
+    each value across walkers.
+
+    Walker `i` seeds its generator from `seed` and `i`, so results only
+    depend on `seed`, `n` and `walkers`, not on the number of workers.
+    """
+    if seed is None:
+        seed = random.randrange(2 ** 32)
+    walkers = max(1, min(walkers, n))
+    pages, links = index_links(corpus)
+    tasks = [
+        (walker, damping_factor, n // walkers + (walker < n % walkers), seed)
+        for walker in range(walkers)
+    ]
+
+    with Pool(workers or cpu_count(), initializer=init_walker, initargs=(links,)) as pool:
+        results = pool.map(run_walker, tasks)
+
+    # Merge visit counts, and compare the estimates of individual walkers
+    totals = [0] * len(pages)
+    estimates = [[] for _ in pages]
+    for (_, _, samples, _), counts in zip(tasks, results):
+        for i, count in enumerate(counts):
+            totals[i] += count
+            estimates[i].append(count / samples)
+
+    ranks = {page: totals[i] / n for i, page in enumerate(pages)}
+    errors = {}
+    for i, page in enumerate(pages):
+        mean = sum(estimates[i]) / walkers
+        variance = sum((e - mean) ** 2 for e in estimates[i]) / max(walkers - 1, 1)
+        errors[page] = math.sqrt(variance / walkers)
+    return ranks, errors
+
+
+class ConvergenceTrace():
+    """
+    Records the L1 change and wall time of every iteration when passed
+    as the `callback` of `iterate_pagerank` or `vectorized_pagerank`.
+    """
+
+    def __init__(self):
+        self.residuals = []
+        self.seconds = []
+
+    def __call__(self, iteration, residual, seconds):
+        self.residuals.append(residual)
+        self.seconds.append(seconds)
+
+    def __len__(self):
+        return len(self.residuals)
+
+    def total_seconds(self):
+        return sum(self.seconds)
+
+    def print(self, file=sys.stdout):
+        for i, (residual, seconds) in enumerate(zip(self.residuals, self.seconds)):
+            print(f"  iteration {i + 1:>4}: L1 change {residual:.3e} "
+                  f"in {seconds * 1000:.2f} ms", file=file)
+        print(f"  {len(self)} iterations in {self.total_seconds():.4f} s", file=file)
+
+
+def iterate_pagerank(corpus, damping_factor, dangling="links", initial=None, stats=None,
+                     threshold=THRESHOLD, callback=None):
     """
     Return PageRank values for each page by iteratively updating
     PageRank values until convergence.
@@ -114,6 +390,21 @@ def iterate_pagerank(corpus, damping_factor):
     Return a dictionary where keys are page names, and values are
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
+
+    Pages without links are treated as linking to every page. With
+    `dangling="links"` those links are added to `corpus` itself; with
+    `dangling="scalar"` the corpus is left untouched and the rank of
+    those pages is spread evenly over all pages on every iteration.
+
+    If `initial` maps pages to earlier PageRank values, iteration starts
+    from them instead of from 1/N, which after small changes to the
+    corpus converges in a few iterations. If `stats` is a dict, the
+    number of iterations is stored in it.
+
+    Iteration stops once no page's rank changes by more than `threshold`.
+    If `callback` is given, it is called after every iteration with the
+    iteration number, the L1 change of the ranks and the seconds the
+    iteration took; see `ConvergenceTrace`.
     """
     pagerank = {}
 
@@ -124,40 +415,47 @@ def iterate_pagerank(corpus, damping_factor):
             no_links.add(p)
     
     # For every page that does not have any links to other pages, create links to every page including itself:
-    for n in no_links:
-        for p in corpus:
-            corpus[n].add(p)
+    if dangling == "links":
+        for n in no_links:
+            for p in corpus:
+                corpus[n].add(p)
+        no_links = set()
 
-    # Get all pages that links to a page argument
-    def get_links_to_page(corpus, page):
-        links_to_page = set()
-        for p in corpus:
-            if page in corpus[p]:
-                links_to_page.add(p)
-    
-        return links_to_page
-    
     # Get dictionary of links to every page. Tha is dictinary that maps page to links that lead to this page.
-    links_to_pages = {}
-    for p in corpus:
-        links_to_p = get_links_to_page(corpus=corpus, page=p)
-        links_to_pages[p] = links_to_p
+    # It is built in one pass over all links instead of scanning the corpus once per page.
+    links_to_pages = {p: set() for p in corpus}
+    for i in corpus:
+        for p in corpus[i]:
+            links_to_pages[p].add(i)
     
-    # Set initial pagerank to pages 1/N
+    # Set initial pagerank to pages 1/N, or start from the given pageranks.
+    # New pages start at 1/N and the total is scaled back to 1.
     for page in corpus:
         pagerank[page] = 1/len(corpus)
+    if initial is not None:
+        for page in corpus:
+            if page in initial:
+                pagerank[page] = initial[page]
+        total = sum(pagerank.values())
+        for page in corpus:
+            pagerank[page] = pagerank[page]/total
     
-    change_value = 0.001
+    change_value = threshold
     change = change_value + 1
+    iterations = 0
 
-    # While change between pageranks is bigger than 0.001 continue to calculate pageranks
+    # While change between pageranks is bigger than threshold continue to calculate pageranks
     while change > change_value:
+        start = time.perf_counter()
+
+        # A page without links passes its pagerank to every page equally, including itself
+        dangling_pagerank = sum(pagerank[n] for n in no_links)/len(corpus)
+
         second_option_pageranks = {}
         for p in corpus:
 
             # If there are no links to current page p then we assume that a page rank for this page is 0
-            if len(links_to_pages[p]) == 0:
-                second_option_pageranks[p] = 0
+            second_option_pageranks[p] = dangling_pagerank
             
             # For the second condition, we need to consider each possible page i that links to page p. For each of those incoming pages, 
             # let NumLinks(i) be the number of links on page i. Each page i that links to p has its own PageRank, PR(i), 
@@ -168,11 +466,7 @@ def iterate_pagerank(corpus, damping_factor):
             for i in links_to_pages[p]:
                 numlinks_i = len(corpus[i])
                 pagerank_i = pagerank[i]
-
-                if (p in second_option_pageranks):
-                    second_option_pageranks[p] = second_option_pageranks[p] + pagerank_i/numlinks_i
-                else:
-                    second_option_pageranks[p] = pagerank_i/numlinks_i
+                second_option_pageranks[p] = second_option_pageranks[p] + pagerank_i/numlinks_i
         
         # new_page rank summs to options of getting ti the page p based on damping_factor
         new_pagerank = {}
@@ -180,16 +474,159 @@ def iterate_pagerank(corpus, damping_factor):
             new_pagerank[p] = (1-damping_factor)/len(corpus) + \
                 damping_factor*(second_option_pageranks[p])
         
-        # Check what the change between newpagerank and the pagerank
+        # Check what the biggest change between newpagerank and the pagerank is
+        change = 0
+        residual = 0
         for p in corpus:
-            change = abs(new_pagerank[p] - pagerank[p])
+            change = max(change, abs(new_pagerank[p] - pagerank[p]))
+            residual += abs(new_pagerank[p] - pagerank[p])
 
         # copy newpagerank to the pagerank
         for p in pagerank:
             pagerank[p] = new_pagerank[p]
+        iterations += 1
+        if callback is not None:
+            callback(iterations, residual, time.perf_counter() - start)
     
+    if stats is not None:
+        stats["iterations"] = iterations
     return pagerank
     
 
+def incoming_links(corpus):
+    """
+    Return a dictionary that maps each page to the pages that link to it.
+    """
+    links_to_pages = {p: [] for p in corpus}
+    for i in corpus:
+        for p in corpus[i]:
+            links_to_pages[p].append(i)
+    return links_to_pages
+
+
+def gauss_seidel_pagerank(corpus, damping_factor, threshold=THRESHOLD, stats=None, callback=None):
+    """
+    Return PageRank values for each page like `iterate_pagerank` with
+    `dangling="scalar"`, but update ranks in place: each page's new rank
+    is computed from the ranks already updated earlier in the same sweep,
+    which usually needs fewer sweeps to converge.
+
+    Ranks are scaled back to a sum of 1 after every sweep, and iteration
+    stops once no page's rank changes by more than `threshold`.
+    `stats` and `callback` work as in `iterate_pagerank`.
+    """
+    n = len(corpus)
+    links_to_pages = incoming_links(corpus)
+    pages = sorted(corpus)
+    pagerank = {p: 1/n for p in pages}
+    no_links = [p for p in pages if not corpus[p]]
+    dangling_pagerank = len(no_links)/n
+
+    iterations = 0
+    change = threshold + 1
+    while change > threshold:
+        start = time.perf_counter()
+        previous = dict(pagerank)
+        for p in pages:
+            rank = dangling_pagerank/n
+            for i in links_to_pages[p]:
+                rank += pagerank[i]/len(corpus[i])
+            rank = (1-damping_factor)/n + damping_factor*rank
+
+            # The rank of a page without links is spread over all pages
+            if not corpus[p]:
+                dangling_pagerank += rank - pagerank[p]
+            pagerank[p] = rank
+
+        total = sum(pagerank.values())
+        for p in pages:
+            pagerank[p] = pagerank[p]/total
+        dangling_pagerank = sum(pagerank[p] for p in no_links)
+
+        change = max(abs(pagerank[p] - previous[p]) for p in pages)
+        iterations += 1
+        if callback is not None:
+            residual = sum(abs(pagerank[p] - previous[p]) for p in pages)
+            callback(iterations, residual, time.perf_counter() - start)
+
+    if stats is not None:
+        stats["iterations"] = iterations
+    return pagerank
+
+
+def adaptive_pagerank(corpus, damping_factor, threshold=THRESHOLD, stats=None, callback=None):
+    """
+    Return PageRank values for each page like `iterate_pagerank` with
+    `dangling="scalar"`, but only update the pages whose rank can still
+    change. A page's new rank depends only on the pages that link to it
+    (and on pages without links), so once none of those changed by more
+    than a small amount in the last iteration, the page is frozen until
+    one of them does. Most pages converge long before the slowest ones,
+    so later iterations only update a few pages. Iteration stops when
+    no page changed by more than that amount.
+
+    `stats` and `callback` work as in `iterate_pagerank`; `stats` also
+    receives the total number of page updates.
+    """
+    n = len(corpus)
+    links_to_pages = incoming_links(corpus)
+    pagerank = {p: 1/n for p in corpus}
+    no_links = [p for p in corpus if not corpus[p]]
+    pages = sorted(corpus)
+    active = pages
+
+    # Changes shrink by about `damping_factor` per iteration, so a page
+    # whose rank changes by less than this will move by less than
+    # `threshold` in all later iterations together
+    freeze_threshold = threshold*(1-damping_factor)/damping_factor
+
+    iterations = 0
+    updates = 0
+    dangling_pagerank = sum(pagerank[p] for p in no_links)/n
+    while active:
+        start = time.perf_counter()
+
+        # New ranks are computed from the old ones, as in `iterate_pagerank`
+        new_pagerank = {}
+        for p in active:
+            rank = dangling_pagerank
+            for i in links_to_pages[p]:
+                rank += pagerank[i]/len(corpus[i])
+            new_pagerank[p] = (1-damping_factor)/n + damping_factor*rank
+        updates += len(active)
+
+        # Pages linked to from a page that changed have to be updated again
+        residual = 0
+        next_active = set()
+        for p in active:
+            change = abs(new_pagerank[p] - pagerank[p])
+            residual += change
+            if change > freeze_threshold:
+                next_active.update(corpus[p])
+            pagerank[p] = new_pagerank[p]
+
+        # A change in the rank of pages without links reaches every page
+        new_dangling_pagerank = sum(pagerank[p] for p in no_links)/n
+        if damping_factor*abs(new_dangling_pagerank - dangling_pagerank) > freeze_threshold:
+            active = pages
+        else:
+            active = sorted(next_active)
+        dangling_pagerank = new_dangling_pagerank
+
+        iterations += 1
+        if callback is not None:
+            callback(iterations, residual, time.perf_counter() - start)
+
+    # Frozen pages stop short of their final ranks, so the sum is restored
+    total = sum(pagerank.values())
+    for p in pagerank:
+        pagerank[p] = pagerank[p]/total
+
+    if stats is not None:
+        stats["iterations"] = iterations
+        stats["updates"] = updates
+    return pagerank
+
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
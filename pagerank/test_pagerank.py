@@ -0,0 +1,140 @@
+import contextlib
+import copy
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from pagerank import DAMPING, crawl, iterate_pagerank, main
+
+DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+
+
+# PageRank of each corpus, the fixed point of the original update rule
+# solved to 1e-14. The original implementation's own stopping rule only
+# compared the last page, so it could stop early (by up to 0.05 on corpus1).
+REFERENCE = {
+    "corpus0": {
+        "1.html": 0.2199138196, "2.html": 0.4292089874, "3.html": 0.2199138196,
+        "4.html": 0.1309633733,
+    },
+    "corpus1": {
+        "bfs.html": 0.1149406547, "dfs.html": 0.0806601086, "games.html": 0.2278718908,
+        "minesweeper.html": 0.1182741250, "minimax.html": 0.1309266117,
+        "search.html": 0.2090524841, "tictactoe.html": 0.1182741250,
+    },
+    "corpus2": {
+        "ai.html": 0.1886856027, "algorithms.html": 0.1065539864, "c.html": 0.1240120628,
+        "inference.html": 0.1289622009, "logic.html": 0.0263626053,
+        "programming.html": 0.2297634296, "python.html": 0.1240120628,
+        "recursion.html": 0.0716480495,
+    },
+    "dangling": {
+        "1.html": 0.2069163177, "2.html": 0.1997860933, "3.html": 0.3696042725,
+        "4.html": 0.1118466582, "5.html": 0.1118466582,
+    },
+}
+
+
+class TestScalarDangling(unittest.TestCase):
+    """
+    `iterate_pagerank(..., dangling="scalar")` must give the same ranks as
+    the original `dangling="links"` mode without changing the corpus.
+    """
+
+    def corpora(self):
+        corpora = {
+            name: crawl(os.path.join(DIRECTORY, name))
+            for name in ("corpus0", "corpus1", "corpus2")
+        }
+
+        # Two pages without links, one of which nothing links to
+        corpora["dangling"] = {
+            "1.html": {"2.html", "3.html"},
+            "2.html": {"3.html"},
+            "3.html": set(),
+            "4.html": {"1.html"},
+            "5.html": set(),
+        }
+        return corpora
+
+    def test_matches_reference(self):
+        for name, corpus in self.corpora().items():
+            for dangling in ("links", "scalar"):
+                with self.subTest(corpus=name, dangling=dangling):
+                    ranks = iterate_pagerank(
+                        copy.deepcopy(corpus), DAMPING, dangling=dangling, threshold=1e-12)
+                    self.assertEqual(ranks.keys(), REFERENCE[name].keys())
+                    for page, rank in REFERENCE[name].items():
+                        self.assertAlmostEqual(ranks[page], rank, places=9)
+
+    def test_corpus_unchanged(self):
+        for name, corpus in self.corpora().items():
+            with self.subTest(corpus=name):
+                before = copy.deepcopy(corpus)
+                iterate_pagerank(corpus, DAMPING, dangling="scalar")
+                self.assertEqual(corpus, before)
+
+
+class TestIncrementalState(unittest.TestCase):
+    """
+    Ranks warm-started from a `--state` file must match a fresh solve,
+    however the crawl cache was updated since the state was saved.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.state = os.path.join(self.directory, "state.json")
+        self.corpus = os.path.join(self.directory, "corpus")
+
+    def run_main(self, *args):
+        """
+        Run `pagerank.py` on the copied corpus and return the ranks it
+        prints from iteration.
+        """
+        output = io.StringIO()
+        argv = ["pagerank.py", self.corpus, "--samples", "100", "--threshold", "1e-10", *args]
+        with mock.patch("sys.argv", argv), contextlib.redirect_stdout(output), \
+                contextlib.redirect_stderr(io.StringIO()):
+            main()
+        lines = output.getvalue().split("PageRank Results from Iteration\n")[1].splitlines()
+        ranks = {}
+        for line in lines:
+            page, rank = line.strip().split(": ")
+            ranks[page] = float(rank)
+        return ranks
+
+    def assertFresh(self, ranks):
+        expected = iterate_pagerank(crawl(self.corpus), DAMPING, dangling="scalar", threshold=1e-10)
+        self.assertEqual(ranks.keys(), expected.keys())
+        for page in expected:
+            self.assertAlmostEqual(ranks[page], expected[page], delta=1e-4)
+
+    def test_cache_updated_without_state(self):
+        shutil.copytree(os.path.join(DIRECTORY, "corpus1"), self.corpus)
+        self.run_main("--cache", "--state", self.state)
+
+        # Remove a link, and let a run without the state update the cache
+        path = os.path.join(self.corpus, "games.html")
+        with open(path) as f:
+            contents = f.read()
+        with open(path, "w") as f:
+            f.write(contents.replace('href="minesweeper.html"', 'href="missing.html"'))
+        self.run_main("--cache")
+
+        self.assertFresh(self.run_main("--cache", "--state", self.state))
+
+    def test_state_of_other_corpus(self):
+        shutil.copytree(os.path.join(DIRECTORY, "corpus2"), self.corpus)
+        self.run_main("--cache", "--state", self.state)
+        shutil.rmtree(self.corpus)
+
+        shutil.copytree(os.path.join(DIRECTORY, "corpus1"), self.corpus)
+        self.assertFresh(self.run_main("--cache", "--state", self.state))
+
+
+if __name__ == "__main__":
+    unittest.main()
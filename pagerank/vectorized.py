@@ -0,0 +1,240 @@
+import time
+
+import numpy as np
+import scipy.sparse as sp
+
+TOLERANCE = 1e-8
+MAX_ITERATIONS = 100
+
+# Number of parallel random walks used by batched_sample_pagerank,
+# and the fewest steps each of them should take
+WALKERS = 10000
+MIN_STEPS = 100
+
+# Teleport distributions solved together by personalized_pagerank
+BLOCK_COLUMNS = 32
+
+
+class LinkMatrix():
+    """
+    Column-stochastic transition matrix of a corpus, built once.
+
+    `matrix[j, i]` is 1/NumLinks(i) when page `i` links to page `j`.
+    Pages without links have an empty column and are flagged in `dangling`;
+    their rank is spread evenly over all pages, as if they linked to every
+    page including themselves.
+    """
+
+    def __init__(self, corpus):
+        self.pages = list(corpus)
+        self.index = {page: i for i, page in enumerate(self.pages)}
+        n = len(self.pages)
+
+        sources = []
+        targets = []
+        for page, links in corpus.items():
+            i = self.index[page]
+            for link in links:
+                sources.append(i)
+                targets.append(self.index[link])
+        sources = np.array(sources, dtype=np.int64)
+        targets = np.array(targets, dtype=np.int64)
+
+        out_degree = np.bincount(sources, minlength=n)
+        self.dangling = out_degree == 0
+        weights = 1.0 / out_degree[sources]
+        self.matrix = sp.csr_matrix((weights, (targets, sources)), shape=(n, n))
+
+        # Out-links of page i are out_links[offsets[i]:offsets[i + 1]]
+        self.out_degree = out_degree
+        self.offsets = np.concatenate(([0], np.cumsum(out_degree)))
+        self.out_links = targets[np.argsort(sources, kind="stable")]
+
+    def __len__(self):
+        return len(self.pages)
+
+    def step(self, ranks, damping_factor):
+        """
+        Apply one power-iteration step to a rank vector, or to each column
+        of a matrix of rank vectors.
+        """
+        n = len(self.pages)
+        dangling_mass = ranks[self.dangling].sum(axis=0)
+        return (1 - damping_factor) / n + damping_factor * (
+            self.matrix @ ranks + dangling_mass / n)
+
+    def to_dict(self, ranks):
+        return {page: float(ranks[i]) for i, page in enumerate(self.pages)}
+
+
+def vectorized_pagerank(corpus, damping_factor,
+                        tolerance=TOLERANCE, max_iterations=MAX_ITERATIONS,
+                        links=None, callback=None):
+    """
+    Return PageRank values for each page by sparse power iteration,
+    stopping once the L1 change between iterations is below `tolerance`
+    or after `max_iterations` iterations.
+
+    `links` may be a LinkMatrix already built for `corpus`.
+    The corpus is not modified. `callback` is called after every
+    iteration as in `iterate_pagerank`.
+    """
+    if links is None:
+        links = LinkMatrix(corpus)
+
+    ranks = np.full(len(links), 1 / len(links))
+    for iteration in range(max_iterations):
+        start = time.perf_counter()
+        new_ranks = links.step(ranks, damping_factor)
+        change = np.abs(new_ranks - ranks).sum()
+        ranks = new_ranks
+        if callback is not None:
+            callback(iteration + 1, float(change), time.perf_counter() - start)
+        if change < tolerance:
+            break
+
+    return links.to_dict(ranks)
+
+
+def teleport_matrix(links, seed_sets):
+    """
+    Return a sparse matrix with one teleport distribution per column:
+    column `k` is spread evenly over the pages in `seed_sets[k]`.
+    """
+    rows = []
+    columns = []
+    weights = []
+    for k, seeds in enumerate(seed_sets):
+        seeds = set(seeds)
+        for page in seeds:
+            rows.append(links.index[page])
+            columns.append(k)
+            weights.append(1 / len(seeds))
+    return sp.csc_matrix((weights, (rows, columns)), shape=(len(links), len(seed_sets)))
+
+
+def personalized_pagerank(corpus, damping_factor, teleport,
+                          tolerance=TOLERANCE, max_iterations=MAX_ITERATIONS,
+                          links=None):
+    """
+    Return personalized PageRank values for many teleport distributions
+    at once, as a matrix with one column per distribution and one row
+    per page, in the order of `links.pages`.
+
+    `teleport` has one column per distribution and one row per page, and
+    may be dense or sparse; see `teleport_matrix`. Each column is scaled
+    to sum to 1. With probability `1 - damping_factor`, and from pages
+    without links, the surfer jumps to a page drawn from the column's
+    distribution instead of from all pages.
+
+    Columns are solved together in blocks of BLOCK_COLUMNS: each
+    iteration multiplies the transition matrix by all the columns of a
+    block that have not converged yet. A column has converged, and is
+    dropped from its block, when its L1 change is below `tolerance`.
+    """
+    if links is None:
+        links = LinkMatrix(corpus)
+
+    # Teleport distributions are kept as (page, column, weight) triples,
+    # which are few when each distribution covers a handful of pages
+    teleport = sp.coo_matrix(teleport, dtype=np.float64)
+    if teleport.shape[0] != len(links):
+        teleport = teleport.T
+    totals = np.asarray(teleport.sum(axis=0)).ravel()
+    if np.any(totals <= 0):
+        raise ValueError("Every teleport distribution needs a positive total")
+    rows, columns = teleport.row, teleport.col
+    weights = teleport.data / totals[columns]
+
+    def block_teleport(active):
+        """
+        Return the teleport entries of the columns in `active`, with
+        columns numbered by their position in `active`.
+        """
+        position = np.full(teleport.shape[1], -1)
+        position[active] = np.arange(len(active))
+        selected = position[columns] >= 0
+        return rows[selected], position[columns[selected]], weights[selected]
+
+    # Column sums as matrix-vector products, which are faster than
+    # summing a row-major block along its columns
+    dangling = links.dangling.astype(np.float64)
+    ones = np.ones(len(links))
+
+    # SciPy multiplies a CSC matrix by a block of columns faster than a CSR one
+    matrix = links.matrix.tocsc()
+
+    ranks = np.zeros(teleport.shape)
+    for start in range(0, ranks.shape[1], BLOCK_COLUMNS):
+        active = np.arange(start, min(start + BLOCK_COLUMNS, ranks.shape[1]))
+        block_rows, block_columns, block_weights = block_teleport(active)
+        block = np.zeros((len(links), len(active)))
+        block[block_rows, block_columns] = block_weights
+
+        for iteration in range(max_iterations):
+            dangling_mass = dangling @ block
+            new_block = matrix @ block
+            new_block *= damping_factor
+            jump = 1 - damping_factor + damping_factor * dangling_mass
+            new_block[block_rows, block_columns] += block_weights * jump[block_columns]
+
+            # Compute the change in place, as blocks can be large
+            block -= new_block
+            np.abs(block, out=block)
+            converged = ones @ block < tolerance
+            block = new_block
+            if converged.all() or iteration == max_iterations - 1:
+                ranks[:, active] = block
+                break
+            if converged.any():
+                ranks[:, active[converged]] = block[:, converged]
+                active = active[~converged]
+                block = block[:, ~converged]
+                block_rows, block_columns, block_weights = block_teleport(active)
+
+    return ranks
+
+
+def batched_sample_pagerank(corpus, damping_factor, n, walkers=WALKERS,
+                            seed=None, links=None):
+    """
+    Return PageRank values for each page by sampling `n` pages with
+    `walkers` random walks that all take a step at the same time.
+
+    Each walk starts at a random page. On each step, with probability
+    `damping_factor` a walker follows a random link of its page, and
+    otherwise (or if the page has no links) jumps to a random page.
+    Fewer walkers are used if that is needed for each of them to take
+    at least MIN_STEPS steps, so that walks move away from their start.
+    """
+    if links is None:
+        links = LinkMatrix(corpus)
+    rng = np.random.default_rng(seed)
+    pages = len(links)
+    walkers = max(1, min(walkers, n // MIN_STEPS))
+    steps = -(-n // walkers)
+
+    counts = np.zeros(pages, dtype=np.int64)
+    position = rng.integers(pages, size=walkers)
+    visited = 0
+    for step in range(steps):
+
+        # The last step only counts as many walkers as are still needed
+        taken = min(walkers, n - visited)
+        counts += np.bincount(position[:taken], minlength=pages)
+        visited += taken
+        if step == steps - 1:
+            break
+
+        degree = links.out_degree[position]
+        follow = (rng.random(walkers) < damping_factor) & (degree > 0)
+        choice = (rng.random(walkers) * degree).astype(np.int64)
+        jump = rng.integers(pages, size=walkers)
+        if len(links.out_links):
+            followed = links.out_links[
+                np.where(follow, links.offsets[position] + choice, 0)]
+            position = np.where(follow, followed, jump)
+        else:
+            position = jump
+
+    return links.to_dict(counts / n)